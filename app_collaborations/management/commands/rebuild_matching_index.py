@@ -0,0 +1,21 @@
+"""
+A management command which rebuilds the collaborator-matching index
+(``MatchingEntry``) from the profiles, creative fields and projects
+stored in the database.
+
+Calls ``MatchingEntry.rebuild()`` for each user.
+
+"""
+
+from django.core.management.base import NoArgsCommand
+
+from app_users.models import UserProfile
+from app_collaborations.models import MatchingEntry
+
+
+class Command(NoArgsCommand):
+    help = "Rebuild the collaborator-matching index of all the users"
+
+    def handle_noargs(self, **options):
+        for u in UserProfile.objects.all():
+            MatchingEntry.rebuild(u.id)
@@ -0,0 +1,192 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models
+from django.db.models.signals import post_save, post_delete
+from djangoappengine.db.utils import get_cursor, set_cursor
+from djangotoolbox.db.utils import bulk_create, prefetch_related
+
+from app_collaborations.options import CREATIVE_FIELDS
+from app_users.models import UserProfile
+from app_users.models_nn import CreativeFields
+from app_projects.models import Project
+from app_projects.models_nn import Collaborations
+from app_projects.signals import votes_changed
+
+# Task queue used for the updates of the index
+MATCHING_QUEUE_NAME    = getattr(settings, 'MATCHING_QUEUE_NAME', 'default')
+# Seconds the update of the entries of a user is delayed by (changes in between are merged)
+MATCHING_REBUILD_DELAY = getattr(settings, 'MATCHING_REBUILD_DELAY', 5)
+
+
+#=========================================================================
+# MATCHING INDEX
+#=========================================================================
+class MatchingEntry(models.Model):
+    """
+    Entry of the collaborator-matching index, one for each creative field of each user.
+    It carries all the data needed to filter and rank the candidates, so that they can be selected with a single read.
+    Each entry has a deterministic key (see :func:`get_entry_id`), so that a rebuild overwrites the entries of the user
+
+    :userprofile: the candidate (:class:`app_users.models.UserProfile`)
+    :creative_field: creative field of the candidate
+    :availability: availability of the candidate
+    :country: nationality of the candidate
+    :fee: boolean that state if the candidate is available to work for free
+    :num_projects: number of projects owned or collaborated by the candidate
+    :num_votes: total number of votes of those projects
+    """
+    id             = models.CharField(primary_key=True, max_length=100)
+    userprofile    = models.ForeignKey(UserProfile)
+    creative_field = models.CharField(max_length=3)
+    availability   = models.CharField(max_length=2, blank=True)
+    country        = models.CharField(max_length=2, blank=True)
+    fee            = models.NullBooleanField()
+    num_projects   = models.IntegerField(default=0)
+    num_votes      = models.IntegerField(default=0)
+
+    @classmethod
+    def get_entry_id(cls, userprofile_id, creative_field):
+        """
+        Return the key of the entry of a user for a creative field
+        """
+        return '%s:%s' % (userprofile_id, creative_field)
+
+    @classmethod
+    def rebuild(cls, userprofile_id):
+        """
+        Replace the entries of a user with new ones, computed from his profile, creative fields and projects.
+        The new entries overwrite the old ones, and the entries of the creative fields the user doesn't have are deleted by key
+        """
+        try:
+            u = UserProfile.objects.get(pk=userprofile_id)
+        except UserProfile.DoesNotExist:
+            cls.objects.filter(pk__in=[cls.get_entry_id(userprofile_id, x) for x, _ in CREATIVE_FIELDS]).delete()
+            return
+
+        creative_fields = set([x.creative_field for x in CreativeFields.objects.filter(userprofile=u)])
+
+        stale = [cls.get_entry_id(u.id, x) for x, _ in CREATIVE_FIELDS if x not in creative_fields]
+        cls.objects.filter(pk__in=stale).delete()
+
+        if not creative_fields:
+            return
+
+        projects     = list(u.get_projects_own()) + u.get_projects_collaborate()
+        num_projects = len(projects)
+        num_votes    = sum([x.get_votes() for x in projects])
+
+        bulk_create([cls(id=cls.get_entry_id(u.id, cf), userprofile=u, creative_field=cf, availability=u.availability,
+                         country=u.country, fee=u.fee, num_projects=num_projects, num_votes=num_votes) for cf in creative_fields])
+
+    def rank_key(self):
+        """
+        Score used to rank the candidates: number of projects, then number of votes, then oldest users first
+        """
+        return (self.num_projects, self.num_votes, -self.userprofile_id)
+
+    def rank_bound(self):
+        """
+        Upper bound of the `rank_key` of this entry and of all the following ones in `iter_candidates`
+        """
+        return (self.num_projects, self.num_votes, 0)
+
+    @classmethod
+    def iter_candidates(cls, creative_field, batch_size=20):
+        """
+        Iterate over the entries of a creative field, from the highest number of projects and votes,
+        fetching them lazily in batches
+        """
+        query  = cls.objects.filter(creative_field=creative_field).order_by('-num_projects', '-num_votes')
+        cursor = None
+        while True:
+            batch  = set_cursor(query, start=cursor)[:batch_size]
+            for x in batch:
+                yield x
+            if len(batch) < batch_size:
+                return
+            cursor = get_cursor(batch)
+
+    @classmethod
+    def resolve(cls, entries):
+        """
+        Fetch in batch the users of a list of entries (and their `User`), binding them to the entries
+        """
+        prefetch_related(entries, 'userprofile')
+        UserProfile.prefetch(list(set([x._userprofile_cache for x in entries if hasattr(x, '_userprofile_cache')])))
+        return entries
+
+
+def _rebuild_lock_key(userprofile_id):
+    return 'matching:rebuild:%s:lock' % userprofile_id
+
+def schedule_rebuild(userprofile_ids):
+    """
+    Enqueue a rebuild of the entries of a list of users on the deferred task queue,
+    skipping the users whose rebuild is already pending
+    """
+    ids = [x for x in set(userprofile_ids) if x is not None and cache.add(_rebuild_lock_key(x), True, MATCHING_REBUILD_DELAY)]
+    if not ids:
+        return
+
+    from google.appengine.ext import deferred
+    deferred.defer(rebuild_matching_entries, ids, _countdown=MATCHING_REBUILD_DELAY, _queue=MATCHING_QUEUE_NAME)
+
+def rebuild_matching_entries(userprofile_ids):
+    """
+    Rebuild the entries of a list of users
+
+    .. note:: executed by the deferred task queue handler
+    """
+    # Changes from now on schedule a new rebuild
+    cache.delete_many([_rebuild_lock_key(x) for x in userprofile_ids])
+
+    for x in userprofile_ids:
+        MatchingEntry.rebuild(x)
+
+
+
+#=========================================================================
+# MAINTENANCE
+#=========================================================================
+def userprofile_changed_handler(sender, instance, **kwargs):
+    """
+    Availability, country or fee of a user changed
+    """
+    schedule_rebuild([instance.id])
+post_save.connect(userprofile_changed_handler, sender=UserProfile)
+
+def userprofile_deleted_handler(sender, instance, **kwargs):
+    MatchingEntry.objects.filter(pk__in=[MatchingEntry.get_entry_id(instance.id, x) for x, _ in CREATIVE_FIELDS]).delete()
+post_delete.connect(userprofile_deleted_handler, sender=UserProfile)
+
+def creative_fields_changed_handler(sender, instance, **kwargs):
+    """
+    A creative field has been added to or removed from a user
+    """
+    schedule_rebuild([instance.userprofile_id])
+post_save.connect(creative_fields_changed_handler, sender=CreativeFields)
+post_delete.connect(creative_fields_changed_handler, sender=CreativeFields)
+
+def collaborations_changed_handler(sender, instance, **kwargs):
+    """
+    A user joined or left a project
+    """
+    schedule_rebuild([instance.userprofile_id])
+post_save.connect(collaborations_changed_handler, sender=Collaborations)
+post_delete.connect(collaborations_changed_handler, sender=Collaborations)
+
+def project_created_handler(sender, instance, created, **kwargs):
+    if created:
+        schedule_rebuild([instance.owner_id])
+post_save.connect(project_created_handler, sender=Project)
+
+def project_deleted_handler(sender, instance, **kwargs):
+    schedule_rebuild([instance.owner_id])
+post_delete.connect(project_deleted_handler, sender=Project)
+
+def votes_changed_handler(sender, project, **kwargs):
+    """
+    The votes of a project changed: update its owner and collaborators in background
+    """
+    schedule_rebuild([project.owner_id] + [x.userprofile_id for x in Collaborations.objects.filter(project=project)])
+votes_changed.connect(votes_changed_handler)
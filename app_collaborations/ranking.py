@@ -0,0 +1,56 @@
+import heapq
+
+
+class TopK(object):
+    """
+    Bounded selection of the `k` items with the highest key, kept in a min-heap
+
+    :k: max number of items to keep
+    :key: function returning the score of an item (must be a total order, e.g. ending with a unique tie-break)
+    """
+    def __init__(self, k, key):
+        self.k    = k
+        self.key  = key
+        self.heap = []
+
+    def is_full(self):
+        return len(self.heap) >= self.k
+
+    def push(self, item):
+        """
+        Add an item, dropping the lowest one if the heap is already full
+
+        :returns: True if the item has been kept
+        """
+        entry = (self.key(item), item)
+        if not self.is_full():
+            heapq.heappush(self.heap, entry)
+            return True
+        if entry[0] > self.heap[0][0]:
+            heapq.heapreplace(self.heap, entry)
+            return True
+        return False
+
+    def select(self, items, bound=None, accept=None):
+        """
+        Push all the accepted items of an iterable.
+
+        If the items come sorted by decreasing `bound`, the iteration stops (without consuming the rest
+        of the iterable) as soon as the heap is full and no following item can beat its lowest key
+
+        :param bound: function returning an upper bound of the key of an item and of all the following ones
+        :param accept: function telling if an item has to be considered
+        :returns: the selected items, from the highest to the lowest
+        """
+        for x in items:
+            if bound and self.is_full() and bound(x) < self.heap[0][0]:
+                break
+            if accept is None or accept(x):
+                self.push(x)
+        return self.items()
+
+    def items(self):
+        """
+        Return the selected items, from the highest to the lowest
+        """
+        return [x[1] for x in sorted(self.heap, key=lambda x: x[0], reverse=True)]
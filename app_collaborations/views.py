@@ -6,9 +6,10 @@ from respite import Views
 from respite.decorators import rest_login_required
 
 from app_collaborations.forms import CollaborationsForm
+from app_collaborations.models import MatchingEntry
+from app_collaborations.ranking import TopK
 from app_collaborations.options import get_creative_fields, get_creative_field_verbose
 from app_users.models import UserProfile
-from app_users.models_nn import CreativeFields
 from app_projects.decorators import must_be_owner      
 
 
@@ -118,48 +119,36 @@ class CollaborationViews(Views):
     @must_be_owner
     def calculate_results(self, request, id, p, pay, location, creative_fields, availabilities):
         """
-        Find collaborators:
+        Find collaborators, using the matching index (:class:`app_collaborations.models.MatchingEntry`):
             1. groups users based on creative fields (excluding the user himself)
             2. keep only those users with a matching availability
             3. filter based on location
             4. filter based on willingness to pay (if yes use all the users, otherwise use all the users with fee equal to true or null)
-            5. for each creative field, order users by number of projects and votes
-            6. for each creative field, select only the first ones
+            5. for each creative field, select the first users by number of projects and votes,
+               reading the candidates in batches until no other one can enter the top
         
         :Decorators: ``rest_login_required, must_be_owner``
         :Rest Types: ``GET``
         :URL: ``^collaborations/(?P<id>[0-9]+)/results(?:/$|.(html|json)$)``
         """
-        # Retrieve username of current user
-        username = str(request.user)
-
-        # Groups users based on creative fields (excluding the user himself)
+        # Groups index entries based on creative fields, as lazy streams ordered by projects and votes
         # groups:
-        #   {'WD': [<UserProfile: aa>, <UserProfile: altro>],
-        #    'WV': [<UserProfile: aa>]}
-        groups = self.__filter_creative_fields(p, creative_fields, username)
-
-        # Keep only those users with a matching Availability
-        groups = self.__filter_availability(groups, availabilities)
-
-        # Filter based on location
-        groups = self.__filter_location(groups, location)
+        #   {'WD': <iterator of MatchingEntry>,
+        #    'WV': <iterator of MatchingEntry>}
+        groups = self.__filter_creative_fields(p, creative_fields)
 
-        # Filter based on pay
+        # Keep only those users (excluding the user himself) with a matching availability, location and pay
         #   pay = yes --> use all the users
         #   pay = no  --> use all the users with fee=true or null
-        groups = self.__filter_pay(groups, pay)
+        accept = self.__build_filter(p, availabilities, location, pay)
 
-        # For each creative field, order users by number of projects and votes
-        # users_ordered:
+        # For each creative field, select the first LIMIT users by number of projects and votes
+        # groups:
         #   {'WD': [{'num_projects': 4, 'num_votes': 2, 'u': <UserProfile: altro>},
         #           {'num_projects': 1, 'num_votes': 0, 'u': <UserProfile: aa>}],
         #    'WV': [{'num_projects': 1, 'num_votes': 0, 'u': <UserProfile: aa>}]}
-        groups = self.__order_by_projects(groups)
-
-        # For each creative field, select only the first LIMIT users
         limit  = 10
-        groups = self.__limit(groups, limit)
+        groups = self.__top_by_projects(groups, accept, limit)
 
         # Return iterator to template
         groups = groups.iteritems()
@@ -177,8 +166,8 @@ class CollaborationViews(Views):
 
 
 
-    def __filter_creative_fields(self, p, creative_fields, username):
-        ''' Returns all the users with those creative fields '''
+    def __filter_creative_fields(self, p, creative_fields):
+        ''' Returns the index entries of all the users with those creative fields '''
         if creative_fields == []:
             # Use all the creative fields of the category of the project
             category = p.get_category_complete()
@@ -191,14 +180,8 @@ class CollaborationViews(Views):
         # For each field select users having it
         groups = {}
         for cf in creative_fields:
-            # Select users with at least one of these fields
-            user_with_cf = CreativeFields.objects.filter(creative_field=cf)
-
-            # Avoid duplicates and the user himself
-            users = []
-            for x in user_with_cf:
-                if x.userprofile not in users and x.userprofile.user.username != str(username):
-                    users.append(x.userprofile)
+            # Select users with this field (one entry per user)
+            users = MatchingEntry.iter_candidates(cf)
 
             # Get verbose name of creative field
             verbose_name = get_creative_field_verbose(cf)
@@ -209,70 +192,42 @@ class CollaborationViews(Views):
         return groups
 
 
-    def __filter_availability(self, groups, availabilities):
-        ''' Keep only those users with a matching Availability '''
-        new_groups = {}
-        for k,v in groups.items():
-            new_groups[k] = filter(lambda x: x.availability in availabilities, v)
-
-        return new_groups
-
-
-    def __filter_location(self, groups, location):
-        ''' Keep only those users with a matching Location '''
-        any_location = '--'
-        if location == any_location:
-            return groups
-
-        new_groups = {}
-        for k,v in groups.items():
-            new_groups[k] = filter(lambda x: x.country == location, v)
-
-        return new_groups
-
-
-    def __filter_pay(self, groups, pay):
+    def __build_filter(self, p, availabilities, location, pay):
         '''
-        Keep only those users with a matching Fee 
-            pay = yes --> use all the users
-            pay = no  --> use all the users with fee=true or null
+        Returns a function telling if an index entry matches the search:
+            - the user is not the owner of the project
+            - the availability is one of the requested ones
+            - the location is the requested one (any if '--')
+            - pay = no --> fee=true or null
         '''
+        any_location    = '--'
         pay_no, pay_yes = 0, 1
 
-        if pay == pay_yes:
-            # Keep all the users
-            return groups
-
-        # Use all the users with fee=true or none
-        new_groups = {}
-        for k,v in groups.items():
-            new_groups[k] = filter(lambda x: x.fee == True or x.fee == None, v)
+        def accept(x):
+            if x.userprofile_id == p.owner_id:
+                return False
+            if x.availability not in availabilities:
+                return False
+            if location != any_location and x.country != location:
+                return False
+            if pay != pay_yes and not (x.fee == True or x.fee == None):
+                return False
+            return True
 
-        return new_groups
+        return accept
 
 
-    def __order_by_projects(self, groups):
-        ''' For each user, retrieve number of projects and number of votes of each project '''
+    def __top_by_projects(self, groups, accept, limit=10):
+        ''' For each creative field, keep the LIMIT accepted users with most projects and votes '''
         new_groups = {}
         for k,v in groups.items():
-            users_projects = map(lambda x: 
-                    {'u': x, 
-                     'num_projects': len(x.get_projects_own()) + len(x.get_projects_collaborate()),
-                     'num_votes': reduce(lambda y,z: y+z.get_votes(), x.get_projects_own(), 0) + 
-                                  reduce(lambda y,z: y+z.get_votes(), x.get_projects_collaborate(), 0)
-                     }, 
-                     v)
-            users_sorted   = sorted(users_projects)
-            users_sorted.reverse()
-            new_groups[k]  = users_sorted
+            ranker = TopK(limit, key=MatchingEntry.rank_key)
+            new_groups[k] = ranker.select(v, bound=MatchingEntry.rank_bound, accept=accept)
 
-        return new_groups
+        # Fetch the selected users in batch
+        MatchingEntry.resolve([x for v in new_groups.values() for x in v])
 
-
-    def __limit(self, groups, limit=10):
-        new_groups = {}
-        for k,v in groups.items():
-            new_groups[k] = v[:limit]
+        for k,v in new_groups.items():
+            new_groups[k] = [{'u': x.userprofile, 'num_projects': x.num_projects, 'num_votes': x.num_votes} for x in v]
 
         return new_groups
-
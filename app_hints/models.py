@@ -0,0 +1,182 @@
+import collections
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models
+from django.db.models.signals import post_save, post_delete
+from djangotoolbox.fields import ListField
+
+from app_users.models import UserProfile
+from app_projects.models import Project
+from app_projects.models_nn import Votes, Collaborations
+
+# Number of categories and of projects per category in the feed
+HINTS_MAX_CATEGORIES = 5
+HINTS_MAX_PROJECTS   = 10
+# Age after which a feed is rebuilt in background, even without changes
+HINTS_FEED_TTL       = getattr(settings, 'HINTS_FEED_TTL', timedelta(days=1))
+# Task queue used to build the feeds
+HINTS_QUEUE_NAME     = getattr(settings, 'HINTS_QUEUE_NAME', 'default')
+
+
+#=========================================================================
+# FEED
+#=========================================================================
+class HintsFeed(models.Model):
+    """
+    Materialized list of the projects suggested to a user, built in background
+
+    The feed of a user has a deterministic key (see :func:`get_feed_id`), so that it is fetched by key
+    instead of by a query, and concurrent builds overwrite the same feed instead of duplicating it
+
+    :userprofile: the user of interest
+    :projects: ids of the suggested projects, in order
+    :scores: number of votes of each suggested project
+    :updated: last time the feed has been built
+    """
+    id          = models.CharField(primary_key=True, max_length=100)
+    userprofile = models.ForeignKey(UserProfile)
+    projects    = ListField(models.IntegerField())
+    scores      = ListField(models.IntegerField())
+    updated     = models.DateTimeField()
+
+    @classmethod
+    def get_feed_id(cls, userprofile_id):
+        """
+        Return the key of the feed of a user
+        """
+        return 'feed:%s' % userprofile_id
+
+    def get_projects(self):
+        """
+        Fetch in batch the suggested projects, skipping the deleted ones
+        """
+        projects = Project.objects.in_bulk(self.projects)
+        return [projects[x] for x in self.projects if x in projects]
+
+    def discard(self, project_id):
+        """
+        Remove a project from the feed, if present
+        """
+        if project_id in self.projects:
+            i = self.projects.index(project_id)
+            del self.projects[i]
+            del self.scores[i]
+            self.save()
+
+    def is_expired(self):
+        return self.updated + HINTS_FEED_TTL < datetime.now()
+
+
+
+#=========================================================================
+# BUILD
+#=========================================================================
+def build_hints_feed(userprofile_id):
+    """
+    Find interesting projects for a user and store them in his `HintsFeed`:
+        1. create an ordered list of most frequent categories - both from his projects (owned/collaborated) and from his votes
+        2. for each category select the most voted projects not connected with the user (not owned, not collaborated, not already voted)
+
+    .. note:: executed by the deferred task queue handler
+    """
+    cache.delete(_rebuild_lock_key(userprofile_id))
+    try:
+        u = UserProfile.objects.get(pk=userprofile_id)
+    except UserProfile.DoesNotExist:
+        HintsFeed.objects.filter(pk=HintsFeed.get_feed_id(userprofile_id)).delete()
+        return None
+
+    # Extract the projects connected to the user (owned, collaborated, voted)
+    connected = list(u.get_projects_own()) + u.get_projects_collaborate() + u.get_projects_voted()
+    connected_ids = set([x.id for x in connected])
+
+    # Count the frequencies of each category: [(u'IT', 3), (u'PI', 1), (u'DS', 1)]
+    most_frequent = collections.Counter([x.category for x in connected]).most_common(HINTS_MAX_CATEGORIES)
+
+    # For each category select the most voted projects, skipping the connected ones:
+    # at most len(connected_ids) of them can precede the ones to keep
+    projects, scores = [], []
+    for category, frequency in most_frequent:
+        projects_set = Project.objects.filter(category=category).order_by('-num_votes')
+        selected     = [x for x in projects_set[:HINTS_MAX_PROJECTS + len(connected_ids)] if x.id not in connected_ids]
+        for x in selected[:HINTS_MAX_PROJECTS]:
+            projects.append(x.id)
+            scores.append(x.get_votes())
+
+    # Overwrite the feed, if any
+    feed = HintsFeed(id=HintsFeed.get_feed_id(u.id), userprofile=u, projects=projects, scores=scores, updated=datetime.now())
+    feed.save(force_insert=True)
+    return feed
+
+
+def _rebuild_lock_key(userprofile_id):
+    return 'hints:rebuild:%s' % userprofile_id
+
+def schedule_hints_feed(userprofile_id):
+    """
+    Enqueue a rebuild of the feed of a user, unless another one is already pending
+    """
+    if not cache.add(_rebuild_lock_key(userprofile_id), True, 60):
+        return
+
+    from google.appengine.ext import deferred
+    deferred.defer(build_hints_feed, userprofile_id, _queue=HINTS_QUEUE_NAME)
+
+
+def get_hints_feed(u):
+    """
+    Return the feed of a user with a single read: the feed is built on the fly only the first time,
+    and rebuilt in background when expired
+    """
+    try:
+        feed = HintsFeed.objects.get(pk=HintsFeed.get_feed_id(u.id))
+    except HintsFeed.DoesNotExist:
+        return build_hints_feed(u.id)
+
+    if feed.is_expired():
+        schedule_hints_feed(u.id)
+    return feed
+
+
+
+#=========================================================================
+# INVALIDATION
+#=========================================================================
+def _discard_and_schedule(userprofile_id, project_id):
+    """
+    The user is now connected to the project: drop it from his feed right away,
+    and recompute the categories in background
+    """
+    try:
+        HintsFeed.objects.get(pk=HintsFeed.get_feed_id(userprofile_id)).discard(project_id)
+    except HintsFeed.DoesNotExist:
+        pass
+    schedule_hints_feed(userprofile_id)
+
+def votes_saved_handler(sender, instance, created, **kwargs):
+    if created:
+        _discard_and_schedule(instance.user_id, instance.project_id)
+post_save.connect(votes_saved_handler, sender=Votes)
+
+def votes_deleted_handler(sender, instance, **kwargs):
+    schedule_hints_feed(instance.user_id)
+post_delete.connect(votes_deleted_handler, sender=Votes)
+
+def collaborations_saved_handler(sender, instance, created, **kwargs):
+    if created:
+        _discard_and_schedule(instance.userprofile_id, instance.project_id)
+post_save.connect(collaborations_saved_handler, sender=Collaborations)
+
+def collaborations_deleted_handler(sender, instance, **kwargs):
+    schedule_hints_feed(instance.userprofile_id)
+post_delete.connect(collaborations_deleted_handler, sender=Collaborations)
+
+def project_created_handler(sender, instance, created, **kwargs):
+    if created:
+        schedule_hints_feed(instance.owner_id)
+post_save.connect(project_created_handler, sender=Project)
+
+def userprofile_deleted_handler(sender, instance, **kwargs):
+    HintsFeed.objects.filter(pk=HintsFeed.get_feed_id(instance.id)).delete()
+post_delete.connect(userprofile_deleted_handler, sender=UserProfile)
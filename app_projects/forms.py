@@ -37,10 +37,10 @@ class CollaboratorsAddForm(forms.Form):
 		colls = Collaborations.objects.filter(project=pj_filter)
 		already_present = []
 		for coll in colls: 
-			already_present.append(coll.userprofile.id)
+			already_present.append(coll.userprofile_id)
 
 		# Add the current user to the already_present users
-		already_present.append(pj_filter.owner.id)
+		already_present.append(pj_filter.owner_id)
 
 		# ModelChoiceField with a list of users that exclude the ones contained in already_present
 		self.fields.insert(len(self.fields)-1, 'collaborators',
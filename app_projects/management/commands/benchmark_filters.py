@@ -0,0 +1,46 @@
+"""
+A management command which benchmarks the in-memory filtering of
+entities (``_matches_filters`` of the nonrel query), as used for
+queries the datastore can't answer on its own: the WHERE tree compiled
+once into a predicate, against the tree decoded again for each entity.
+
+"""
+
+import time
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+from django.db.models import Q
+
+from app_projects.models import Project
+
+
+class Command(NoArgsCommand):
+    help = "Benchmark the in-memory filtering of entities against a WHERE tree"
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--entities', dest='entities', type='int', default=100000,
+            help='Number of entities to filter'),
+    )
+
+    def handle_noargs(self, **options):
+        n        = options['entities']
+        queryset = Project.objects.filter(num_votes__gte=10).filter(
+            Q(num_votes__lt=n // 2) | Q(category='GR')).exclude(num_votes=20)
+        entities = [{'num_votes': i, 'category': ['GR', 'PH', 'WR'][i % 3]} for i in range(n)]
+
+        query = queryset.query.get_compiler(using='default').build_query()
+        where = queryset.query.where
+
+        # Decoding is timed on a tenth of the entities
+        start = time.time()
+        for entity in entities[::10]:
+            query._compile_filters(where)(entity)
+        decoding = (time.time() - start) * 10
+
+        start = time.time()
+        matches = len([x for x in entities if query._matches_filters(x, where)])
+        compiled = time.time() - start
+
+        self.stdout.write("decoded:  %.3fs\n" % decoding)
+        self.stdout.write("compiled: %.3fs (%d matches)\n" % (compiled, matches))
@@ -0,0 +1,69 @@
+"""
+A management command which benchmarks the respite JSON serializer on
+a list of wrapped projects (shaped like the output of
+``Project.wrapper()``, but built in memory), both serializing the
+whole list at once and streaming it in chunks.
+
+"""
+
+import datetime
+import time
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from respite.serializers import JSONSerializer
+
+
+def fake_profile(i):
+    return {
+        'first_name': u'First %d' % i, 'last_name': u'Last %d' % i,
+        'full_name': u'First %d Last %d' % (i, i), 'sex': u'Female',
+        'birthday': datetime.date(1980, 1, 1 + i % 28), 'website': u'http://example.com/%d' % i,
+        'phone': u'', 'country': u'Italy', 'availability': u'Full Time',
+        'username': u'user%d' % i, 'email': u'user%d@example.com' % i,
+        'profile_pic': u'http://www.gravatar.com/avatar/%032d' % i,
+        'connected_accounts': [u'linkedin', u'flickr'],
+        'employment': {'headline': u'Headline', 'industry': u'Design', 'company': u'Company', 'title': u'Title'},
+        'creative_fields': [u'graphic_design', u'photography'],
+    }
+
+def fake_project(i):
+    return {
+        'id': i, 'title': u'Project %d' % i, 'summary': u'Summary of the project %d' % i * 4,
+        'category': {'id': u'graphic_design', 'name': u'Graphic Design'},
+        'start_date': datetime.date(2012, 1 + i % 12, 1), 'end_date': u'Ongoing',
+        'website': u'http://example.com/projects/%d' % i, 'num_votes': i % 50,
+        'owner': fake_profile(i),
+        'collaborators': [fake_profile(i + 1), fake_profile(i + 2)],
+        'material': {'description': True, 'flickr': True, 'tumblr': False, 'youtube': False},
+    }
+
+
+class Command(NoArgsCommand):
+    help = "Benchmark the serialization of wrapped projects to JSON"
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--projects', dest='projects', type='int', default=10000,
+            help='Number of wrapped projects to serialize'),
+    )
+
+    def handle_noargs(self, **options):
+        context = {
+            'title': u'All Projects',
+            'project_list': [fake_project(i) for i in range(options['projects'])],
+            'next': None,
+        }
+
+        start = time.time()
+        content = JSONSerializer(context).serialize(None)
+        serialized = time.time() - start
+
+        start = time.time()
+        chunks = 0
+        for chunk in JSONSerializer(context).stream(None):
+            chunks += 1
+        streamed = time.time() - start
+
+        self.stdout.write("serialize: %.3fs (%d characters)\n" % (serialized, len(content)))
+        self.stdout.write("stream:    %.3fs (%d chunks)\n" % (streamed, chunks))
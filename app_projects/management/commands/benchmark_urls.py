@@ -0,0 +1,97 @@
+"""
+A management command which checks that all the named respite routes
+can be reversed, and benchmarks the resolution of their paths against
+the urlconf, comparing the combined regular expressions of
+``respite.urls.ResourceResolver`` with matching the urlpatterns of
+each resource one by one.
+
+"""
+
+import time
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+from django.core.urlresolvers import RegexURLResolver, get_resolver, NoReverseMatch
+
+from respite.urls.resource import ResourceResolver
+
+# Values of the named groups of the routes, to build sample paths by.
+SAMPLE_KWARGS = {
+    'id': '42',
+    'username': 'johndoe',
+    'category': 'graphic_design',
+    'min_votes': '1',
+    'max_votes': '10',
+    'field_id': 'website',
+    'backend': 'linkedin',
+    'token': 'abc123',
+}
+
+
+def linearize(patterns):
+    """Return a copy of the given urlpatterns, with resources expanded into their urlpatterns."""
+    result = []
+    for pattern in patterns:
+        if isinstance(pattern, ResourceResolver):
+            result.extend(pattern.url_patterns)
+        elif isinstance(pattern, RegexURLResolver):
+            result.append(RegexURLResolver(pattern.regex.pattern, linearize(pattern.url_patterns),
+                pattern.default_kwargs, pattern.app_name, pattern.namespace))
+        else:
+            result.append(pattern)
+    return result
+
+def sample_paths(resolver, patterns):
+    """
+    Return the paths of the named urlpatterns of the resources in the given urlpatterns,
+    and the names that can't be reversed.
+    """
+    paths, failed = [], []
+    for pattern in patterns:
+        if isinstance(pattern, ResourceResolver):
+            for p in pattern.url_patterns:
+                kwargs = dict([(name, SAMPLE_KWARGS.get(name, '1')) for name in p.regex.groupindex])
+                try:
+                    path = '/' + resolver.reverse(p.name, **kwargs)
+                except NoReverseMatch:
+                    failed.append(p.name)
+                else:
+                    if path not in paths:
+                        paths.append(path)
+        elif isinstance(pattern, RegexURLResolver):
+            sub_paths, sub_failed = sample_paths(resolver, pattern.url_patterns)
+            paths.extend([path for path in sub_paths if path not in paths])
+            failed.extend(sub_failed)
+    return paths, failed
+
+class Command(NoArgsCommand):
+    help = "Benchmark the resolution of the paths of the respite routes"
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--rounds', dest='rounds', type='int', default=1000,
+            help='Number of times to resolve every path'),
+    )
+
+    def handle_noargs(self, **options):
+        combined = get_resolver(None)
+        linear = RegexURLResolver(combined.regex.pattern, linearize(combined.url_patterns))
+        paths, failed = sample_paths(combined, combined.url_patterns)
+
+        # Every route must be reversible by its name
+        for name in failed:
+            self.stderr.write("%s can't be reversed\n" % name)
+
+        for path in paths:
+            a, b = combined.resolve(path), linear.resolve(path)
+            if (a.func, a.args, a.kwargs) != (b.func, b.args, b.kwargs):
+                self.stderr.write("%s resolves differently: %r != %r\n" % (path, a, b))
+
+        for title, resolver in [('one by one', linear), ('combined', combined)]:
+            start = time.time()
+            for i in range(options['rounds']):
+                for path in paths:
+                    resolver.resolve(path)
+            elapsed = time.time() - start
+
+            self.stdout.write("%-10s %.3fs (%.1fus per path)\n" % (
+                title, elapsed, elapsed / (options['rounds'] * len(paths)) * 1000000))
@@ -0,0 +1,20 @@
+"""
+A management command which rebuilds the vote counters of the projects
+from the ``Votes`` relationships stored in the database.
+
+Calls ``Project.recount_votes()`` for each project, which resets the
+shards of the counter and the denormalized ``num_votes`` field.
+
+"""
+
+from django.core.management.base import NoArgsCommand
+
+from app_projects.models import Project
+
+
+class Command(NoArgsCommand):
+    help = "Recompute the vote counters of all the projects from their votes"
+
+    def handle_noargs(self, **options):
+        for p in Project.objects.all():
+            p.recount_votes()
@@ -1,15 +1,144 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
 from django.db import models
+from django.db.models.signals import post_save, post_delete
 from django.forms.models import model_to_dict
 from settings import BASE_URL
+from djangoappengine.db.utils import filter_in, commit_locked
+from djangotoolbox.db.utils import prefetch_related
+from respite.cache import bump_version
 
 from app_users.models import UserProfile
-from app_projects.models_nn import Votes, Collaborations
+from app_users.signals import profile_changed
+from app_projects.models_nn import Votes, VotesCounter, Collaborations
+from app_projects.signals import votes_changed
 from app_collaborations.options import CATEGORIES, get_category_verbose
 
 from app_socialnetworks.tumblr import TumblrClient
 from app_socialnetworks.flickr import FlickrClient
 
 
+#=========================================================================
+# MATERIAL CACHE
+#=========================================================================
+# Seconds after which the cached external material is stale and gets refreshed in background
+MATERIAL_CACHE_TTL       = getattr(settings, 'MATERIAL_CACHE_TTL', 15 * 60)
+# Seconds for which a stale entry is still served while it is being refreshed
+MATERIAL_CACHE_MAX_STALE = getattr(settings, 'MATERIAL_CACHE_MAX_STALE', 24 * 60 * 60)
+# Task queue used for the refreshes
+MATERIAL_QUEUE_NAME      = getattr(settings, 'MATERIAL_QUEUE_NAME', 'default')
+# Seconds for which the hit/miss counters of the cache are kept
+MATERIAL_STATS_TIMEOUT   = 24 * 60 * 60
+
+
+def _material_cache_key(material_id):
+    return 'material:external:%s' % material_id
+
+def _material_cache_count(name):
+    """
+    Increment the `name` counter of the material cache (hits, stale, misses)
+    """
+    key = 'material:stats:%s' % name
+    cache.add(key, 0, MATERIAL_STATS_TIMEOUT)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+def get_material_cache_stats():
+    """
+    Return the hit/miss counters of the material cache
+    """
+    names = ['hits', 'stale', 'misses']
+    stats = cache.get_many(['material:stats:%s' % x for x in names])
+    return dict([(x, stats.get('material:stats:%s' % x, 0)) for x in names])
+
+def refresh_external_material(material_id):
+    """
+    Fetch from the social networks the external material of a `Material` and store it in the cache
+
+    .. note:: executed by the deferred task queue handler
+    """
+    key = _material_cache_key(material_id)
+    try:
+        material = Material.objects.get(pk=material_id)
+    except Material.DoesNotExist:
+        cache.delete(key)
+        return
+
+    entry = {
+        'data': material.fetch_external(),
+        'refresh_at': time.time() + MATERIAL_CACHE_TTL,
+    }
+    cache.set(key, entry, MATERIAL_CACHE_MAX_STALE)
+    cache.delete(key + ':lock')
+
+    # Show the new material in the pages of the projects
+    for project_id in Project.objects.filter(material=material_id).values_list('id', flat=True):
+        bump_version('project', project_id)
+
+
+
+#=========================================================================
+# VOTES
+#=========================================================================
+# Seconds between two refreshes of the number of votes of a project (votes in between are merged)
+VOTES_REFRESH_DELAY = getattr(settings, 'VOTES_REFRESH_DELAY', 10)
+# Task queue used for the refreshes
+VOTES_QUEUE_NAME    = getattr(settings, 'VOTES_QUEUE_NAME', 'default')
+
+
+def _votes_lock_key(project_id):
+    return 'project:votes:%s:lock' % project_id
+
+def schedule_votes_refresh(project_id):
+    """
+    Enqueue a refresh of the number of votes of a project on the deferred task queue,
+    unless one is already pending
+    """
+    if not cache.add(_votes_lock_key(project_id), True, VOTES_REFRESH_DELAY):
+        return
+
+    from google.appengine.ext import deferred
+    deferred.defer(refresh_votes, project_id, _countdown=VOTES_REFRESH_DELAY, _queue=VOTES_QUEUE_NAME)
+
+def refresh_votes(project_id):
+    """
+    Store in `num_votes` the sum of the shards of the vote counter of a project
+
+    .. note:: executed by the deferred task queue handler
+    """
+    # Votes from now on schedule a new refresh
+    cache.delete(_votes_lock_key(project_id))
+
+    p = _set_num_votes(project_id, VotesCounter.total(project_id))
+    if p is not None:
+        votes_changed.send(sender=Project, project=p)
+
+@commit_locked
+def _set_num_votes(project_id, count):
+    """
+    Store `count` in the `num_votes` of a project
+
+    :returns: the project, or `None` if it doesn't exist or its number of votes didn't change
+
+    .. note:: runs in a transaction
+    """
+    try:
+        p = Project.objects.get(pk=project_id)
+    except Project.DoesNotExist:
+        return None
+
+    if p.num_votes == count:
+        return None
+
+    p.num_votes = count
+    p.save(keep_num_votes=False)
+    return p
+
+
+
 #=========================================================================
 # MATERIAL
 #=========================================================================
@@ -90,6 +219,7 @@ class Material(models.Model):
 
         # Upload Text Post
         f.add_text(title, body)
+        self.refresh_external(force=True)
 
 
     def tumblr_add_link(self, username, title, url):
@@ -99,6 +229,7 @@ class Material(models.Model):
         username = str(username)
         f = self.get_client(username)
         f.add_link(title, url)
+        self.refresh_external(force=True)
 
 
     def tumblr_add_quote(self, username, quote):
@@ -108,6 +239,7 @@ class Material(models.Model):
         username = str(username)
         f = self.get_client(username)
         f.add_quote(quote)
+        self.refresh_external(force=True)
 
     def tumblr_add_chat(self, username, title, conversation):
         """
@@ -116,6 +248,7 @@ class Material(models.Model):
         username = str(username)
         f = self.get_client(username)
         f.add_chat(title, conversation)
+        self.refresh_external(force=True)
 
 
     def tumblr_add_photo(self, username, source, data):
@@ -125,6 +258,7 @@ class Material(models.Model):
         username = str(username)
         f = self.get_client(username)
         f.add_photo(source, data)
+        self.refresh_external(force=True)
 
     def tumblr_add_audio(self, username, source):
         """
@@ -133,6 +267,7 @@ class Material(models.Model):
         username = str(username)
         f = self.get_client(username)
         f.add_audio(source)
+        self.refresh_external(force=True)
 
     # def tumblr_add_video(self, username, data):
     #     f = self.get_client(username)
@@ -151,9 +286,9 @@ class Material(models.Model):
         f = FlickrClient(self.flickr)
         n = 6
 
-        photolist = f.get_photolist(6)
+        photolist = f.get_photolist(n)
         if photolist:
-            photos = [f.get_photo(x) for x in photolist]
+            photos = f.get_photos(photolist, max_concurrency=n)
         else:
             photos = None
 
@@ -193,6 +328,61 @@ class Material(models.Model):
         # Associate the new photo to the connected photoset
         f.add_photo_to_photoset(pid)
 
+        # Update the cached photos
+        self.refresh_external(force=True)
+
+
+
+    #=========================================================================
+    # EXTERNAL MATERIAL
+    #=========================================================================
+    def fetch_external(self):
+        """
+        Fetch the external material from the social networks (blocking API calls)
+
+        :returns: a dictionary with the flickr photos and the tumblr posts
+        """
+        return {
+            'flickr_photos': self.flickr_get_photos() if self.flickr else None,
+            'tumblr_posts': self.tumblr_get_posts() if self.tumblr else None,
+        }
+
+
+    def get_external(self):
+        """
+        Return the external material from the cache, without calling the social networks:
+        stale or missing entries are served as they are and refreshed in background
+
+        :returns: a dictionary with the flickr photos and the tumblr posts, or `None` if not cached yet
+        """
+        entry = cache.get(_material_cache_key(self.id))
+
+        if entry is None:
+            _material_cache_count('misses')
+            self.refresh_external()
+            return None
+
+        if entry['refresh_at'] < time.time():
+            _material_cache_count('stale')
+            self.refresh_external()
+        else:
+            _material_cache_count('hits')
+
+        return entry['data']
+
+
+    def refresh_external(self, force=False):
+        """
+        Enqueue a refresh of the cached external material on the deferred task queue
+
+        :param force: if False, skip the refresh if another one is already pending
+        """
+        if not force and not cache.add(_material_cache_key(self.id) + ':lock', True, 60):
+            return
+
+        from google.appengine.ext import deferred
+        deferred.defer(refresh_external_material, self.id, _queue=MATERIAL_QUEUE_NAME)
+
 
 
     #=========================================================================
@@ -239,6 +429,7 @@ class Project(models.Model):
     :end_date: date in which the project ended, if empty still ongoing
     :website: external website of the project
     :material: :class:`app_projects.models.Material` connected to the project
+    :num_votes: number of votes obtained, denormalized from the shards of :class:`app_projects.models_nn.VotesCounter`
     """
     owner    = models.ForeignKey(UserProfile, related_name='projects_own', on_delete=models.CASCADE)
 
@@ -251,6 +442,8 @@ class Project(models.Model):
 
     material = models.ForeignKey(Material, null=True)
 
+    num_votes = models.IntegerField(default=0, editable=False)
+
 
     #=========================================================================
     # METHODS
@@ -261,6 +454,19 @@ class Project(models.Model):
         """
         return 'Project: ' + self.title
 
+    def save(self, *args, **kwargs):
+        """
+        Save the project. Unless `keep_num_votes` is False, the stored `num_votes` is kept,
+        as it is only written by :func:`refresh_votes` and the instance may hold an old value
+        """
+        keep_num_votes = kwargs.pop('keep_num_votes', True)
+        if keep_num_votes and self.pk is not None and not (args and args[0]) and not kwargs.get('force_insert'):
+            try:
+                self.num_votes = Project.objects.get(pk=self.pk).num_votes
+            except Project.DoesNotExist:
+                pass
+        super(Project, self).save(*args, **kwargs)
+
 
     #=========================================================================
     # OWNER
@@ -310,21 +516,28 @@ class Project(models.Model):
         Return a wrapper around all the extra-informations stored in the connected `Material`
 
             - description
-            - flickr photos (via API call)
-            - tumblr posts (via API call)
+            - flickr photos (from the cache of the API calls)
+            - tumblr posts (from the cache of the API calls)
             - youtube videos
+
+        If the external material is not cached yet, `external_pending` is set
         """
         material_dict = self.get_material_wrapper()
         if not material_dict:
             return None
 
+        external = self.material.get_external()
+        if external is None:
+            external = {'flickr_photos': None, 'tumblr_posts': None}
+            material_dict['external_pending'] = bool(material_dict['flickr'] or material_dict['tumblr'])
+
         # Access extra info
         if material_dict['description']:
             material_dict['description'] = self.material.get_description()
         
         if material_dict['flickr']:
             del material_dict['flickr']
-            material_dict['flickr_photos'] = self.material.flickr_get_photos()
+            material_dict['flickr_photos'] = external['flickr_photos']
 
             owner = self.get_owner()
             if owner:
@@ -334,7 +547,7 @@ class Project(models.Model):
 
         if material_dict['tumblr']:
             del material_dict['tumblr']
-            material_dict['tumblr_posts'] = self.material.tumblr_get_posts()
+            material_dict['tumblr_posts'] = external['tumblr_posts']
 
         if material_dict['youtube1'] or material_dict['youtube2']:
             del material_dict['youtube1']
@@ -360,8 +573,12 @@ class Project(models.Model):
         """
         Fetch all the collaborators of the project
         """
-        collaborators_set = Collaborations.objects.filter(project=self)
-        collaborators     = [x.userprofile for x in collaborators_set]
+        collaborators = getattr(self, '_collaborators_cache', None)
+        if collaborators is None:
+            collaborators_set = Collaborations.objects.filter(project=self)
+            ids               = [x.userprofile_id for x in collaborators_set]
+            profiles          = UserProfile.objects.in_bulk(ids)
+            collaborators     = [profiles[x] for x in ids if x in profiles]
         return collaborators
 
     def get_collaborators_wrapper(self):
@@ -369,7 +586,7 @@ class Project(models.Model):
         Fetch all the collaborators of the project, and return their wrappers
         """
         collaborators = self.get_collaborators()
-        return [x.wrapper() for x in collaborators]
+        return UserProfile.wrap_many(collaborators)
 
 
     def delete_collaborators(self):
@@ -385,7 +602,7 @@ class Project(models.Model):
         """
         Delete the collaborators with the specified username
         """
-        collaborators_set = Collaborations.objects.filter(project=self)
+        collaborators_set = prefetch_related(Collaborations.objects.filter(project=self), 'userprofile__user')
         for coll in collaborators_set:
             if coll.userprofile.user.username == str(username):
                 coll.delete()
@@ -398,48 +615,71 @@ class Project(models.Model):
         """
         Return the number of votes obtained from the project
         """
-        return Votes.objects.filter(project=self).count()
+        return self.num_votes
 
     @property 
     def votes(self):
         return self.get_votes()
 
+    @classmethod
+    def has_voted(cls, project_id, user):
+        """
+        Check if a user has voted a project, given the id of the project (no need to fetch it)
+        """
+        return Votes.objects.filter(project=project_id).filter(user=user).exists()
+
     def can_vote(self, user):
         """
         Check if the current user can vote (must not have voted before)
         """
-        # Check that can vote (must not have voted before)
-        v = Votes.objects.filter(project=self).filter(user=user)
-        if v.count() == 1:
-            return False
-        else:
-            return True
+        return not Project.has_voted(self.id, user)
 
     def can_unvote(self, user):
         """
         Check if the current user can unvote (must have voted before)
         """
-        # Check that can unvote (must have voted before)
-        v = Votes.objects.filter(project=self).filter(user=user)
-        if v.count() == 0:
-            return False
-        else:
-            return True
+        return Project.has_voted(self.id, user)
 
     def vote(self, user):
         """
         Add a vote to the project
+
+        .. note:: `num_votes` is updated in background (see :func:`schedule_votes_refresh`)
         """
         v = Votes(project=self, user=user)
         v.save()
 
+        VotesCounter.increment(self, 1)
+        bump_version('project', self.id)
+        schedule_votes_refresh(self.id)
+
     def unvote(self, user):
         """
         Remove a vote from the project
+
+        .. note:: `num_votes` is updated in background (see :func:`schedule_votes_refresh`)
         """
         v = Votes.objects.filter(project=self).filter(user=user)
+        n = v.count()
+        if n == 0:
+            return
         v.delete()
 
+        VotesCounter.increment(self, -n)
+        bump_version('project', self.id)
+        schedule_votes_refresh(self.id)
+
+    def recount_votes(self):
+        """
+        Recompute the vote counter from the `Votes` of the project (repair/backfill)
+        """
+        count = Votes.objects.filter(project=self).count()
+        VotesCounter.reset(self, count)
+        self.num_votes = count
+        if _set_num_votes(self.id, count) is not None:
+            votes_changed.send(sender=Project, project=self)
+        return count
+
 
 
     def delete_connected_data(self):
@@ -452,6 +692,7 @@ class Project(models.Model):
         # Delete votes
         votes = Votes.objects.filter(project=self)
         map(lambda x: x.delete(), votes)
+        VotesCounter.objects.filter(project=self).delete()
     
 
     #=========================================================================
@@ -493,3 +734,76 @@ class Project(models.Model):
         wrapper['material'] = self.get_material_wrapper()
 
         return wrapper
+
+    @classmethod
+    def wrap_many(cls, projects):
+        """
+        Return the wrappers of a list of projects, resolving owners, collaborators and material 
+        of all the projects with batched queries instead of one query per object
+
+        .. seealso:: :func:`wrapper`
+        """
+        projects = list(projects)
+        if not projects:
+            return []
+
+        # Collaborations of all the projects (batched IN query)
+        collaborations = {}
+        for c in sorted(filter_in(Collaborations.objects.all(), 'project', [x.id for x in projects]), key=lambda x: x.pk):
+            collaborations.setdefault(c.project_id, []).append(c.userprofile_id)
+
+        # Owners and collaborators (batch get by key)
+        profile_ids = set([x.owner_id for x in projects])
+        for ids in collaborations.values():
+            profile_ids.update(ids)
+        profiles = UserProfile.objects.in_bulk(profile_ids)
+        UserProfile.prefetch(profiles.values())
+
+        # Material (batch get by key)
+        prefetch_related(projects, 'material')
+
+        # Attach the prefetched data to the projects
+        for p in projects:
+            if p.owner_id in profiles:
+                p._owner_cache = profiles[p.owner_id]
+            p._collaborators_cache = [profiles[x] for x in collaborations.get(p.id, []) if x in profiles]
+
+        return [x.wrapper() for x in projects]
+
+
+
+#=========================================================================
+# MAINTENANCE
+#=========================================================================
+def project_changed_handler(sender, instance, **kwargs):
+    """
+    A project has been saved or deleted
+    """
+    bump_version('project', instance.id)
+post_save.connect(project_changed_handler, sender=Project)
+post_delete.connect(project_changed_handler, sender=Project)
+
+def votes_changed_handler(sender, project, **kwargs):
+    """
+    The votes of a project changed
+    """
+    bump_version('project', project.id)
+votes_changed.connect(votes_changed_handler)
+
+def collaborations_changed_handler(sender, instance, **kwargs):
+    """
+    A user joined or left a project
+    """
+    bump_version('project', instance.project_id)
+post_save.connect(collaborations_changed_handler, sender=Collaborations)
+post_delete.connect(collaborations_changed_handler, sender=Collaborations)
+
+def profile_changed_handler(sender, userprofile_id, **kwargs):
+    """
+    The profile of a user changed: update the projects it owns or collaborates to
+    """
+    ids = list(Project.objects.filter(owner=userprofile_id).values_list('id', flat=True))
+    ids.extend([x.project_id for x in Collaborations.objects.filter(userprofile=userprofile_id)])
+    for project_id in set(ids):
+        bump_version('project', project_id)
+profile_changed.connect(profile_changed_handler)
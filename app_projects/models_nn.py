@@ -1,4 +1,10 @@
+import random
 from django.db import models
+from djangoappengine.db.utils import commit_locked
+
+# Number of shards used by the vote counter of each project
+VOTES_SHARDS = 10
+
 
 class Votes(models.Model):
     """
@@ -13,6 +19,79 @@ class Votes(models.Model):
 
 
 
+class VotesCounter(models.Model):
+    """
+    Model for a shard of the vote counter of a project (:class:`app_projects.models.Project`).
+    Votes are spread among `VOTES_SHARDS` shards, so that concurrent votes on the same project don't contend on a single entity
+
+    Each shard has a deterministic key (see :func:`get_shard_id`), so that it is fetched by key instead of by a query,
+    and can't be duplicated by concurrent votes
+
+    :project: the project of interest
+    :shard: index of the shard
+    :count: number of votes stored in the shard
+    """
+    id      = models.CharField(primary_key=True, max_length=100)
+    project = models.ForeignKey('app_projects.Project')
+    shard   = models.IntegerField()
+    count   = models.IntegerField(default=0)
+
+    @classmethod
+    def get_shard_id(cls, project_id, shard):
+        """
+        Return the key of a shard of the counter of a project
+        """
+        return '%s:%s' % (project_id, shard)
+
+    @classmethod
+    def increment(cls, project, delta=1):
+        """
+        Add `delta` to a random shard of the counter (the shard is fetched or created, and updated, in a transaction)
+        """
+        shard = random.randint(0, VOTES_SHARDS - 1)
+        _increment_shard(cls, project.id, shard, delta)
+
+    @classmethod
+    def total(cls, project_id):
+        """
+        Return the number of votes of a project, given its id, as the sum of all its shards (fetched by key)
+        """
+        ids    = [cls.get_shard_id(project_id, x) for x in range(VOTES_SHARDS)]
+        shards = cls.objects.in_bulk(ids)
+        return sum([x.count for x in shards.values()])
+
+    @classmethod
+    def reset(cls, project, count):
+        """
+        Replace all the shards of the project with a single one holding `count` votes
+        """
+        ids = [cls.get_shard_id(project.id, x) for x in range(VOTES_SHARDS)]
+        cls.objects.filter(pk__in=ids).delete()
+
+        # Shards created before they had deterministic keys
+        cls.objects.filter(project=project).delete()
+
+        if count:
+            cls(id=ids[0], project=project, shard=0, count=count).save(force_insert=True)
+
+@commit_locked
+def _increment_shard(cls, project_id, shard, delta):
+    """
+    Add `delta` to a shard of the counter of a project, creating the shard if missing
+
+    .. note:: runs in a transaction
+    """
+    id = cls.get_shard_id(project_id, shard)
+    try:
+        counter = cls.objects.get(pk=id)
+    except cls.DoesNotExist:
+        cls(id=id, project_id=project_id, shard=shard, count=delta).save(force_insert=True)
+    else:
+        counter.count += delta
+        counter.save()
+
+
+
 class Collaborations(models.Model):
     """
     Model for a `Collaboration`, a many-to-many relationship between 
@@ -0,0 +1,4 @@
+from django.dispatch import Signal
+
+# Sent when the number of votes of a project changes
+votes_changed = Signal(providing_args=['project'])
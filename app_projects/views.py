@@ -1,26 +1,45 @@
+import time
 import urlparse
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render_to_response, get_object_or_404, get_list_or_404
 from django.template import RequestContext
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control
 from django.http import HttpResponseRedirect
 from django.db.models import Count
+from google.appengine.api.datastore_errors import BadValueError
+from djangoappengine.db.utils import get_cursor, set_cursor
 
 from respite import Views
-from respite.decorators import rest_login_required
+from respite.cache import get_version, fragments_key, FRAGMENTS_TIMEOUT
+from respite.decorators import rest_login_required, condition
 from respite.utils import generate_form
 
 from app_collaborations.options import CATEGORIES, get_category_verbose
 from app_users.models import UserProfile
 from app_projects.decorators import must_be_owner, no_conflict_of_interests
 from app_projects.forms import *
-from app_projects.models import Material, Project
+from app_projects.models import Material, Project, MATERIAL_CACHE_TTL
 from app_projects.models_nn import Votes, Collaborations
 
 from app_socialnetworks.oauthclient import NotConnectedException, UploadException, ClearanceException
         
 from social_auth.utils import log
 
+# Ranges of votes advertised by browse_by_votes
+VOTES_RANGES = [
+    {'min': 1, 'max': 10},
+    {'min': 10, 'max': 50},
+    {'min': 50, 'max': 100},
+    {'min': 100, 'max': 1000}
+]
+
+# Number of projects listed in a single page, by default and at most (`page_size` GET parameter)
+PAGE_SIZE     = 20
+MAX_PAGE_SIZE = 100
+
 #=========================================================================
 # ProjectViews
 #=========================================================================
@@ -64,12 +83,40 @@ class ProjectViews(Views):
             )
 
 
+    def _paginate(self, request, projects_set):
+        """
+        Restrict an ordered queryset to the page starting at the opaque `cursor` GET parameter, if any.
+        The size of the page is given by the `page_size` GET parameter, capped to `MAX_PAGE_SIZE`
+
+        :returns: a tuple with the projects of the page and the url of the next page (`None` if this is the last one)
+        """
+        try:
+            page_size = min(max(int(request.GET.get('page_size', PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        except ValueError:
+            page_size = PAGE_SIZE
+
+        try:
+            projects_set = set_cursor(projects_set, start=request.GET.get('cursor'))
+        except BadValueError:
+            # Malformed cursor, start from the first page
+            projects_set = set_cursor(projects_set)
+
+        page = projects_set[:page_size]
+        if len(page) < page_size:
+            return page, None
+
+        # Keep the other parameters (e.g. page_size) in the url of the next page
+        params = request.GET.copy()
+        params['cursor'] = get_cursor(page)
+        return page, '%s?%s' % (request.path, params.urlencode())
+
+
     #=========================================================================
     # INDEX
     #=========================================================================
     def index(self, request, projects_set=None, title=None, messages=None):
         """
-        List all projects in alphabetical order
+        List all projects in alphabetical order, one page at a time (see `_paginate`)
         
         :Rest Types: ``GET``
         :URL: ``^(?:$|index.(html|json)$)``
@@ -77,15 +124,16 @@ class ProjectViews(Views):
         .. note:: accessible also to non-registered users
         """
         if projects_set == None:
-            projects_set = Project.objects.all()
+            # Sort alphabetically
+            projects_set = Project.objects.order_by('title')
 
         if projects_set == False:
             projects = None
+            next_url = None
         else:
-            projects = [x.wrapper() for x in projects_set]
-
-            # Sort alphabetically
-            projects = sorted(projects, key=lambda x: x['title'])
+            # Fetch a single page
+            projects_set, next_url = self._paginate(request, projects_set)
+            projects = Project.wrap_many(projects_set)
 
         if title == None:
             title = "All Projects"
@@ -97,9 +145,11 @@ class ProjectViews(Views):
             context = {
                 'messages': messages,
                 'title': title,
-                'project_list': projects
+                'project_list': projects,
+                'next': next_url
             },
-            status = 200
+            status = 200,
+            stream = True
         )
 
 
@@ -138,6 +188,56 @@ class ProjectViews(Views):
     #=========================================================================
     # SHOW
     #=========================================================================
+    def _show_version(self, request, id, messages=None, errors=None):
+        """
+        Version of the page rendered by :func:`show`, computed without fetching the project:
+        the version of the project, the current user (privileges depend on it) and the period
+        of the cached external material
+
+        :returns: `None` when messages or errors are shown, as they aren't part of the version
+
+        .. note:: pages showing external material that is still being loaded get no ETag (see :func:`show`)
+        """
+        if messages or errors:
+            return None
+        return '%s-%s-%s-%s' % (id, get_version('project', id), request.user.id or 0, int(time.time() // MATERIAL_CACHE_TTL))
+
+    def _show_fragments(self, request, id):
+        """
+        Return the parts of :func:`show` that don't depend on the current user, from the cache
+        if the project didn't change since they were built (see :mod:`respite.cache`)
+
+            - p: the wrapper of the project
+            - material: the extended material of the project
+            - html: the rendered `info`, `material` and `people` fragments of the page (html only)
+
+        .. note:: nothing is cached while the external material is being loaded
+        .. note:: the cache is only populated by ``GET`` requests, as other requests may show
+                  the project right after changing it (e.g. adding a collaborator or a vote)
+        """
+        key       = fragments_key('project', id, get_version('project', id), int(time.time() // MATERIAL_CACHE_TTL))
+        fragments = cache.get(key) or {}
+        changed   = False
+
+        if 'p' not in fragments:
+            p = get_object_or_404(Project, pk=id)
+            fragments['p']        = p.wrapper()
+            fragments['material'] = p.get_material_extended()
+            changed = True
+
+        format = self._get_format(request)
+        if format and format.extension == 'html' and 'html' not in fragments:
+            context = {'p': fragments['p'], 'material': fragments['material']}
+            fragments['html'] = dict([(x, render_to_string('app_projects/project_view_%s.html' % x, context)) for x in ['info', 'material', 'people']])
+            changed = True
+
+        material = fragments['material']
+        if changed and request.method == 'GET' and not (material and material.get('external_pending')):
+            cache.set(key, fragments, FRAGMENTS_TIMEOUT)
+
+        return fragments
+
+    @condition(etag='_show_version')
     def show(self, request, id, messages=None, errors=None):
         """
         Show a :class:`app_projects.models.Project` with all its informations
@@ -156,38 +256,32 @@ class ProjectViews(Views):
         :URL: ``^(?P<id>[0-9]+)(?:/$|.(html|json)$)``
 
         .. note:: accessible also to non-registered users
+        .. note:: answers conditional GET requests with `304 Not Modified` (see :func:`_show_version`)
+        .. note:: the parts that don't depend on the current user are cached (see :func:`_show_fragments`)
         """
         # Retrieve project
-        p = get_object_or_404(Project, pk=id)
-        p_dict = p.wrapper()
-        
+        fragments = self._show_fragments(request, id)
+        p_dict    = fragments['p']
+        username  = str(request.user)
+
         # Check Owner
-        try:
-            owner = p.get_owner
-            if str(p.owner.user.username) == str(request.user):
-                is_owner = True
-            else:
-                is_owner = False
-        except:
+        if p_dict['owner'] and p_dict['owner']['username'] == username:
+            is_owner = True
+        else:
             is_owner = False
 
         # Check Collaborators
-        collaborators = p.get_collaborators_wrapper()
-        if str(request.user) in [x['username'] for x in collaborators]:
+        collaborators = p_dict['collaborators']
+        if username in [x['username'] for x in collaborators]:
             is_collaborator = True
         else:
             is_collaborator = False
 
         # Check if can vote/unvote
         try:
-            username = str(request.user)
             u = UserProfile.objects.get(user__username__iexact=username)
-            if p.can_vote(u):
-                can_vote   = True
-                can_unvote = False
-            else:
-                can_vote   = False
-                can_unvote = True
+            can_unvote = Project.has_voted(id, u)
+            can_vote   = not can_unvote
         except:
             can_vote   = False
             can_unvote = False
@@ -200,23 +294,33 @@ class ProjectViews(Views):
             'can_unvote': can_unvote
         }
 
-        # Material
-        material_extended = p.get_material_extended()
+        context = {
+            'messages': messages,
+            'errors': errors,
+            'p': p_dict,
+            'material': fragments['material'],
+            'privileges': privileges,
+        }
+
+        # Rendered fragments
+        if 'html' in fragments:
+            context['fragments'] = fragments['html']
 
         # Render the page
-        return self._render(
+        response = self._render(
             request = request,
             template = 'project_view',
-            context = {
-                'messages': messages,
-                'errors': errors,
-                'p': p_dict,
-                'material': material_extended,
-                'privileges': privileges,
-            },
+            context = context,
             status = 200
         )
 
+        # The page changes once the external material is loaded: leave it out of conditional GETs
+        material = fragments['material']
+        if material and material.get('external_pending'):
+            patch_cache_control(response, no_store=True)
+
+        return response
+
 
     #=========================================================================
     # EDIT
@@ -376,16 +480,9 @@ class ProjectViews(Views):
 
         .. note:: accessible also to non-registered users
         """
-        # Retrieve all the projects belonging to the category specified
-        projects_set = Project.objects.filter(category=category)
-
-        # Check if the category has at least one project
-        if projects_set.count() > 0:
-            # Retrieve the title from the first project
-            title = projects_set[0].get_category_verbose()
-        else:
-            title = get_category_verbose(category)
-            projects_set = False
+        # Retrieve all the projects belonging to the category specified, in alphabetical order
+        projects_set = Project.objects.filter(category=category).order_by('title')
+        title        = get_category_verbose(category)
 
         return self.index(request, projects_set=projects_set, title=title, messages=None)
 
@@ -428,19 +525,8 @@ class ProjectViews(Views):
         # Create the title
         title = "Votes %s - %s" % (min_votes, max_votes)
 
-        # Calculate boundary
-        min_votes = int(min_votes) - 1 
-        max_votes = int(max_votes) + 1
-
-        # Get all projects
-        all_projects = Project.objects.all()
-
-        # Filter projects belonging to the range of votes
-        projects_set = []
-        for pj in all_projects:
-            v = Votes.objects.filter(project=pj).count()
-            if v > min_votes and v < max_votes:
-                projects_set.append(pj)       
+        # Filter projects belonging to the range of votes, using the index on num_votes
+        projects_set = Project.objects.filter(num_votes__gte=int(min_votes)).filter(num_votes__lte=int(max_votes)).order_by('-num_votes')
 
         return self.index(request, projects_set=projects_set, title=title, messages=None)
 
@@ -455,12 +541,7 @@ class ProjectViews(Views):
         .. note:: accessible also to non-registered users
         """
         # Retrieve Categories
-        categories = [
-            {'min': 1, 'max': 10},
-            {'min': 10, 'max': 50},
-            {'min': 50, 'max': 100},
-            {'min': 100, 'max': 1000}
-        ]
+        categories = VOTES_RANGES
 
         # Render the page
         return self._render(
@@ -568,6 +649,9 @@ class ProjectViews(Views):
                 # Save the new instance
                 new_material.save()
 
+                # The connected blog/photoset may have changed
+                new_material.refresh_external(force=True)
+
                 # Bind it to the project
                 p.material = new_material
                 p.save()
@@ -8,12 +8,15 @@ import time, json, urllib, urllib2, urlparse
 import httplib, httplib2, oauth2
 from datetime import datetime
 import hmac, hashlib
-import signal
+import signal, socket
+import threading, Queue
 import base64
 from uuid import uuid4
 import mimetools, mimetypes
 import xml.etree.ElementTree as ET
 from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_started
 from django.contrib.auth.models import User
 
 def setting(name, default=None):
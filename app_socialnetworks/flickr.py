@@ -16,6 +16,7 @@ class FlickrClient(OauthClient):
     """
     CONSUMER_KEY      = setting('FLICKR_APP_ID')
     CONSUMER_SECRET   = setting('FLICKR_API_SECRET')
+    API_URL           = 'http://api.flickr.com/services/rest/'
     
     def __init__(self, photoset, user_auth=False, auth=False):
         """
@@ -37,25 +38,18 @@ class FlickrClient(OauthClient):
             super(FlickrClient, self).__init__(self.CONSUMER_KEY, self.CONSUMER_SECRET)
         else:
             # Use a simple HTTP client
-            self.client = httplib2.Http()
+            self.client = PooledHttp()
 
 
     def request_token(self, consumer):
         """
-        Retrieve the access token of the user from his connected accounts data
+        Retrieve the access token of the user from his connected accounts data (cached)
         """
-        # Retrieve connected accounts
-        connected_accounts = self.user_auth.social_auth.filter(user=self.user_auth.id).filter(provider="flickr")
-        if len(connected_accounts) == 0:
+        token = get_access_token(self.user_auth, 'flickr')
+        if token is None:
             raise NotConnectedException('Not Connected to Flickr')
 
-        # Retrieve access_token from socialauth
-        access_token       = connected_accounts[0].extra_data['access_token']
-        access_token       = urlparse.parse_qs(access_token)
-        oauth_token        = access_token['oauth_token'][0]
-        oauth_token_secret = access_token['oauth_token_secret'][0]
-
-        return oauth_token, oauth_token_secret        
+        return token
 
 
 
@@ -66,7 +60,7 @@ class FlickrClient(OauthClient):
         """
         Execute a read-only query
         """
-        url = "http://api.flickr.com/services/rest/?method=%s&api_key=%s&%s&per_page=%s&format=json&nojsoncallback=1" % (method, self.CONSUMER_KEY, query, limit)
+        url = "%s?method=%s&api_key=%s&%s&per_page=%s&format=json&nojsoncallback=1" % (self.API_URL, method, self.CONSUMER_KEY, query, limit)
         if optionals:
             url += optionals
 
@@ -119,6 +113,52 @@ class FlickrClient(OauthClient):
             return None
 
 
+    def get_photos(self, photolist, max_concurrency=6):
+        """
+        Get url of a list of photos, fetching them concurrently
+
+        :param photolist: Flickr photos
+        :type photolist: list
+        :param max_concurrency: max number of requests in flight at the same time
+        :type max_concurrency: int
+        :returns: a list with the data of each photo, in the same order of `photolist` (`None` for the photos that could not be fetched)
+        """
+        photos     = [None] * len(photolist)
+        n_workers  = min(max_concurrency, len(photolist))
+
+        if n_workers <= 1:
+            for i, photo in enumerate(photolist):
+                try:
+                    photos[i] = self.get_photo(photo)
+                except Exception:
+                    photos[i] = None
+            return photos
+
+        pending = Queue.Queue()
+        for i, photo in enumerate(photolist):
+            pending.put((i, photo))
+
+        def worker():
+            # The client is backed by the thread-safe connection pool
+            while True:
+                try:
+                    i, photo = pending.get_nowait()
+                except Queue.Empty:
+                    return
+                try:
+                    photos[i] = self.get_photo(photo)
+                except Exception:
+                    photos[i] = None
+
+        threads = [threading.Thread(target=worker) for x in range(n_workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        return photos
+
+
     #=========================================================================
     # WRITE
     #=========================================================================
@@ -152,9 +192,7 @@ class FlickrClient(OauthClient):
 
         content_type, body = self.encode_multipart_formdata(params, files)
         headers = {'Content-Type': content_type, 'Content-Length': str(len(body))}
-        r = urllib2.Request('%s' % upload_api_url, body, headers)
-
-        response = urllib2.urlopen(r).read()
+        resp, response = HTTP_POOL.request(upload_api_url, 'POST', body, headers)
         return response
 
 
@@ -198,7 +236,7 @@ class FlickrClient(OauthClient):
         """
         method = 'flickr.photosets.addPhoto'
         query  = 'photoset_id=%s&photo_id=%s' % (self.photoset, pid)
-        url    = "http://api.flickr.com/services/rest/?method=%s&api_key=%s&%s&format=json&nojsoncallback=1" % (method, self.CONSUMER_KEY, query)
+        url    = "%s?method=%s&api_key=%s&%s&format=json&nojsoncallback=1" % (self.API_URL, method, self.CONSUMER_KEY, query)
 
         resp, content = self.client.request(url, "POST")
         content = json.loads(content)
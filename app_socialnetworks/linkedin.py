@@ -28,20 +28,13 @@ class LinkedInClient(OauthClient):
 
 	def request_token(self, consumer):
 		"""
-        Retrieve the access token of the user from his connected accounts data
+        Retrieve the access token of the user from his connected accounts data (cached)
         """
-		# Retrieve connected accounts
-		connected_accounts = self.user_auth.social_auth.filter(user=self.user_auth.id).filter(provider="linkedin")
-		if len(connected_accounts) == 0:
+		token = get_access_token(self.user_auth, 'linkedin')
+		if token is None:
 			raise NotConnectedException('Not Connected to LinkedIn')
 
-		# Retrieve access_token from socialauth
-		access_token       = connected_accounts[0].extra_data['access_token']
-		access_token       = urlparse.parse_qs(access_token)
-		oauth_token        = access_token['oauth_token'][0]
-		oauth_token_secret = access_token['oauth_token_secret'][0]
-
-		return oauth_token, oauth_token_secret
+		return token
 
 
 	def get_consumer_key(self):
@@ -0,0 +1,13 @@
+from django.db.models.signals import post_save, post_delete
+from social_auth.models import UserSocialAuth
+from app_socialnetworks.oauthclient import invalidate_access_token
+
+
+def invalidate_token_handler(sender, instance, **kwargs):
+    """
+    Drop the cached access token when a social_auth association is saved or deleted
+    """
+    invalidate_access_token(instance.user_id, instance.provider)
+
+post_save.connect(invalidate_token_handler, sender=UserSocialAuth)
+post_delete.connect(invalidate_token_handler, sender=UserSocialAuth)
@@ -19,6 +19,266 @@ class ClearanceException(Exception):
     pass
 
 
+#=========================================================================
+# CONNECTION POOL
+#=========================================================================
+class HttpConnectionPool(object):
+    """
+    Thread-safe pool of persistent (keep-alive) HTTP connections, shared by all the clients
+
+    :max_per_host: max number of connections open at the same time towards the same host
+    :timeout: socket timeout of the connections, in seconds
+    :retries: max number of retries of a failed idempotent request
+    :backoff: seconds to wait before the first retry (doubled at each retry)
+    """
+    IDEMPOTENT_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS')
+    RETRY_STATUSES     = (502, 503, 504)
+
+    def __init__(self, max_per_host=6, timeout=10, retries=2, backoff=0.5):
+        self.max_per_host = max_per_host
+        self.timeout      = timeout
+        self.retries      = retries
+        self.backoff      = backoff
+
+        self._lock  = threading.Lock()
+        self._idle  = {}
+        self._slots = {}
+        self._stats = {'requests': 0, 'created': 0, 'reused': 0, 'retries': 0, 'errors': 0}
+
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+
+    def _acquire(self, key):
+        """
+        Get a connection towards `key` (scheme, host), waiting if `max_per_host` connections are already in use
+
+        :returns: the connection and a flag telling if it has been reused
+        """
+        with self._lock:
+            slots = self._slots.get(key)
+            if slots is None:
+                slots = self._slots[key] = threading.BoundedSemaphore(self.max_per_host)
+        slots.acquire()
+
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self._stats['reused'] += 1
+                return idle.pop(), True
+            self._stats['created'] += 1
+
+        scheme, host = key
+        try:
+            if scheme == 'https':
+                conn = httplib.HTTPSConnection(host, timeout=self.timeout)
+            else:
+                conn = httplib.HTTPConnection(host, timeout=self.timeout)
+        except:
+            # e.g. invalid port: give back the slot
+            slots.release()
+            raise
+        return conn, False
+
+
+    def _release(self, key, conn, keep):
+        """
+        Give back a connection: if `keep`, it stays open to be reused by the next requests
+        """
+        if keep:
+            with self._lock:
+                self._idle.setdefault(key, []).append(conn)
+        else:
+            conn.close()
+        self._slots[key].release()
+
+
+    def request(self, uri, method="GET", body=None, headers=None):
+        """
+        Send a request through a pooled connection, retrying with exponential backoff
+        the idempotent requests that fail or receive a temporary error.
+        A request that fails on a reused connection is retried on a new one if it is idempotent,
+        or if it failed before being sent (so that it can't be executed twice by the server)
+
+        :returns: a tuple (`httplib2.Response`, content), like `httplib2.Http.request`
+        """
+        p    = urlparse.urlsplit(uri)
+        key  = (p.scheme or 'http', p.netloc)
+        path = p.path or '/'
+        if p.query:
+            path += '?' + p.query
+        headers = dict(headers or {})
+
+        self._count('requests')
+        attempt = 0
+        while True:
+            conn, reused = self._acquire(key)
+            sent = False
+            try:
+                conn.request(method, path, body, headers)
+                sent    = True
+                resp    = conn.getresponse()
+                content = resp.read()
+            except (socket.error, httplib.HTTPException):
+                self._release(key, conn, False)
+                if reused and (method in self.IDEMPOTENT_METHODS or not sent):
+                    # The server closed the idle connection in the meantime: retry on a new one
+                    continue
+                if method not in self.IDEMPOTENT_METHODS or attempt >= self.retries:
+                    self._count('errors')
+                    raise
+            else:
+                self._release(key, conn, not resp.will_close)
+                if resp.status not in self.RETRY_STATUSES or method not in self.IDEMPOTENT_METHODS or attempt >= self.retries:
+                    return httplib2.Response(resp), content
+
+            self._count('retries')
+            time.sleep(self.backoff * (2 ** attempt))
+            attempt += 1
+
+
+    def stats(self):
+        """
+        Return the usage metrics of the pool
+
+        :returns: a dictionary with the number of requests, connections created and reused, retries, errors, and the reuse rate
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        opened = stats['created'] + stats['reused']
+        stats['reuse_rate'] = float(stats['reused']) / opened if opened else 0.0
+        return stats
+
+
+HTTP_POOL = HttpConnectionPool(max_per_host=setting('SOCIALNETWORKS_MAX_CONNECTIONS_PER_HOST', 6),
+                               timeout=setting('SOCIALNETWORKS_HTTP_TIMEOUT', 10),
+                               retries=setting('SOCIALNETWORKS_HTTP_RETRIES', 2))
+
+
+class PooledHttp(object):
+    """
+    Drop-in replacement of `httplib2.Http` that sends the requests through the shared pool
+
+    :pool: the :class:`HttpConnectionPool` to use
+    """
+    def __init__(self, pool=None):
+        self.pool = pool or HTTP_POOL
+
+    def request(self, uri, method="GET", body=None, headers=None):
+        return self.pool.request(uri, method, body, headers)
+
+
+class PooledOauthClient(PooledHttp):
+    """
+    Drop-in replacement of `oauth2.Client` that sends the signed requests through the shared pool
+
+    :consumer: oauth2 consumer object
+    :token: oauth2 token object
+    """
+    def __init__(self, consumer, token, pool=None):
+        super(PooledOauthClient, self).__init__(pool)
+        self.consumer = consumer
+        self.token    = token
+        self.method   = oauth2.SignatureMethod_HMAC_SHA1()
+
+    def request(self, uri, method="GET", body='', headers=None):
+        """
+        Sign the request like `oauth2.Client.request` does, then send it
+        """
+        headers = dict(headers or {})
+        if method == "POST":
+            headers.setdefault('Content-Type', 'application/x-www-form-urlencoded')
+
+        is_form_encoded = headers.get('Content-Type') == 'application/x-www-form-urlencoded'
+        if is_form_encoded and body:
+            parameters = dict(urlparse.parse_qsl(body))
+        else:
+            parameters = None
+
+        req = oauth2.Request.from_consumer_and_token(self.consumer, token=self.token, http_method=method, http_url=uri,
+                                                     parameters=parameters, body=body, is_form_encoded=is_form_encoded)
+        req.sign_request(self.method, self.consumer, self.token)
+
+        if is_form_encoded:
+            body = req.to_postdata()
+        elif method == "GET":
+            uri = req.to_url()
+        else:
+            p = urlparse.urlsplit(uri)
+            headers.update(req.to_header(realm='%s://%s' % (p.scheme, p.netloc)))
+
+        return super(PooledOauthClient, self).request(uri, method, body, headers)
+
+
+
+#=========================================================================
+# ACCESS TOKENS
+#=========================================================================
+TOKEN_CACHE_TTL = setting('SOCIALNETWORKS_TOKEN_CACHE_TTL', 24 * 60 * 60)
+
+# Tokens already resolved during the current request
+_request_tokens = threading.local()
+
+def _clear_request_tokens(sender, **kwargs):
+    _request_tokens.__dict__.clear()
+
+request_started.connect(_clear_request_tokens)
+
+
+def _token_cache_key(user_id, provider):
+    return 'socialnetworks:token:%s:%s' % (user_id, provider)
+
+
+def get_access_token(user, provider):
+    """
+    Retrieve the access token of a user for a provider from his connected accounts data,
+    looking first in the tokens of the current request and then in memcache
+
+    :param user: account of the user on Showcase
+    :type user: `User`
+    :param provider: name of the social network
+    :type provider: string
+    :returns: a tuple (oauth_token, oauth_token_secret), or None if the account is not connected
+    """
+    key   = _token_cache_key(user.id, provider)
+    token = _request_tokens.__dict__.get(key)
+    if token is not None:
+        return token
+
+    token = cache.get(key)
+    if token is None:
+        # Retrieve connected accounts
+        connected_accounts = user.social_auth.filter(user=user.id).filter(provider=provider)
+        if len(connected_accounts) == 0:
+            return None
+
+        # Retrieve access_token from socialauth
+        access_token = connected_accounts[0].extra_data['access_token']
+        access_token = urlparse.parse_qs(access_token)
+        token        = (access_token['oauth_token'][0], access_token['oauth_token_secret'][0])
+        cache.set(key, token, TOKEN_CACHE_TTL)
+
+    _request_tokens.__dict__[key] = token
+    return token
+
+
+def invalidate_access_token(user_id, provider):
+    """
+    Drop the cached access token of a user for a provider
+
+    .. note:: called when the social_auth association changes
+    """
+    key = _token_cache_key(user_id, provider)
+    _request_tokens.__dict__.pop(key, None)
+    cache.delete(key)
+
+
+
+#=========================================================================
+# OAUTH CLIENT
+#=========================================================================
 class OauthClient(object):
     """
     Abstract wrapper to be specialized for each social network
@@ -27,7 +287,7 @@ class OauthClient(object):
     :oauth_token: public part of the oauth token
     :oauth_token_secret: secret part of the oauth token
     :token: oauth2 token object
-    :client: oauth2 authenticated client
+    :client: oauth2 authenticated client, using the shared connection pool
     """
     def __init__(self, CONSUMER_KEY, CONSUMER_SECRET):
         """
@@ -48,7 +308,7 @@ class OauthClient(object):
         token = oauth2.Token(key=oauth_token, secret=oauth_token_secret)
 
         # Instantiate the client
-        client = oauth2.Client(consumer, token)
+        client = PooledOauthClient(consumer, token)
 
         # Save fields
         self.consumer = consumer
@@ -132,6 +392,5 @@ class OauthClient(object):
 
         headers= {'Host': host, "Content-type": 'application/x-www-form-urlencoded'}
         self.oauth_gen('POST', uri, params, headers)
-        conn = httplib.HTTPConnection(machine)
-        conn.request('POST', uri, urllib.urlencode(params).replace('/','%2F'), headers)
-        return conn.getresponse()    
+        resp, content = HTTP_POOL.request('http://%s%s' % (machine, uri), 'POST', urllib.urlencode(params).replace('/','%2F'), headers)
+        return content
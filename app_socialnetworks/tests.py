@@ -0,0 +1,161 @@
+import json, time, threading, urlparse, httplib
+import BaseHTTPServer, SocketServer
+
+from django.utils import unittest
+
+from app_socialnetworks.flickr import FlickrClient
+from app_socialnetworks.oauthclient import HttpConnectionPool, PooledHttp
+
+
+#=========================================================================
+# FAKE FLICKR
+#=========================================================================
+LATENCY = 0.2
+
+class FakeFlickrHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Answer to `flickr.photos.getSizes` after `LATENCY` seconds.
+    The photo with id `broken` gets an invalid response
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.enter()
+        try:
+            time.sleep(LATENCY)
+        finally:
+            self.server.leave()
+        query = urlparse.parse_qs(urlparse.urlparse(self.path).query)
+        pid   = query['photo_id'][0]
+
+        if pid == 'broken':
+            body = 'not json'
+        else:
+            body = json.dumps({'sizes': {'size': [
+                {'label': 'Small', 'source': 'http://farm.test/%s_s.jpg' % pid},
+                {'label': 'Medium', 'source': 'http://farm.test/%s_m.jpg' % pid},
+            ]}, 'stat': 'ok'})
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeFlickrServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    Keep track of the max number of requests served at the same time
+    """
+    daemon_threads = True
+
+    def __init__(self, *args, **kwargs):
+        BaseHTTPServer.HTTPServer.__init__(self, *args, **kwargs)
+        self.lock          = threading.Lock()
+        self.in_flight     = 0
+        self.max_in_flight = 0
+
+    def enter(self):
+        with self.lock:
+            self.in_flight     += 1
+            self.max_in_flight  = max(self.max_in_flight, self.in_flight)
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+
+
+#=========================================================================
+# TESTS
+#=========================================================================
+class FakeFlickrTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeFlickrServer(('127.0.0.1', 0), FakeFlickrHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+        self.api_url = FlickrClient.API_URL
+        FlickrClient.API_URL = 'http://127.0.0.1:%s/services/rest/' % self.server.server_address[1]
+
+        self.client    = FlickrClient('photoset')
+        self.photolist = [{'id': str(x)} for x in range(6)]
+
+    def tearDown(self):
+        FlickrClient.API_URL = self.api_url
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FlickrGetPhotosTest(FakeFlickrTestCase):
+
+    def test_order(self):
+        photos = self.client.get_photos(self.photolist)
+        self.assertEqual([x['source'] for x in photos],
+                         ['http://farm.test/%s_m.jpg' % x for x in range(6)])
+
+    def test_failure_isolation(self):
+        photolist = self.photolist[:2] + [{'id': 'broken'}, {}] + self.photolist[2:]
+        photos    = self.client.get_photos(photolist)
+        self.assertEqual(len(photos), 8)
+        self.assertEqual(photos[2], None)
+        self.assertEqual(photos[3], None)
+        self.assertEqual(photos[4]['source'], 'http://farm.test/2_m.jpg')
+
+    def test_concurrency(self):
+        serial = [self.client.get_photo(x) for x in self.photolist]
+        self.assertEqual(self.server.max_in_flight, 1)
+
+        photos = self.client.get_photos(self.photolist, max_concurrency=6)
+        self.assertEqual(photos, serial)
+        self.assertTrue(self.server.max_in_flight > 1)
+
+
+class HttpConnectionPoolTest(FakeFlickrTestCase):
+
+    def setUp(self):
+        super(HttpConnectionPoolTest, self).setUp()
+        self.pool = HttpConnectionPool(max_per_host=2)
+        self.client.client = PooledHttp(self.pool)
+
+    def test_reuse(self):
+        for photo in self.photolist:
+            self.assertEqual(self.client.get_photo(photo)['label'], 'Medium')
+
+        stats = self.pool.stats()
+        self.assertEqual(stats['requests'], 6)
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['reused'], 5)
+
+    def test_max_per_host(self):
+        photos = self.client.get_photos(self.photolist, max_concurrency=6)
+        self.assertEqual(len(filter(None, photos)), 6)
+        self.assertTrue(self.pool.stats()['created'] <= 2)
+
+    def test_no_resend_of_non_idempotent(self):
+        class StaleConnection(object):
+            """
+            Connection closed by the server after the request has been sent
+            """
+            sent = 0
+            def request(self, *args):
+                StaleConnection.sent += 1
+            def getresponse(self):
+                raise httplib.BadStatusLine('')
+            def close(self):
+                pass
+
+        key = ('http', '%s:%s' % self.server.server_address)
+        self.pool._idle[key] = [StaleConnection()]
+        self.assertRaises(httplib.BadStatusLine, self.pool.request, 'http://%s/' % key[1], method='POST')
+        self.assertEqual(StaleConnection.sent, 1)
+
+    def test_slot_released_on_connection_error(self):
+        pool = HttpConnectionPool(max_per_host=1)
+        for i in range(2):
+            self.assertRaises(httplib.InvalidURL, pool.request, 'http://localhost:port/')
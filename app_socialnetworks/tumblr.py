@@ -41,25 +41,18 @@ class TumblrClient(OauthClient):
             super(TumblrClient, self).__init__(self.CONSUMER_KEY, self.CONSUMER_SECRET)
         else:
             # Use a simple HTTP client
-            self.client = httplib2.Http()
+            self.client = PooledHttp()
 
 
     def request_token(self, consumer):
         """
-        Retrieve the access token of the user from his connected accounts data
+        Retrieve the access token of the user from his connected accounts data (cached)
         """
-        # Retrieve connected accounts
-        connected_accounts = self.user_auth.social_auth.filter(user=self.user_auth.id).filter(provider="tumblr")
-        if len(connected_accounts) == 0:
+        token = get_access_token(self.user_auth, 'tumblr')
+        if token is None:
             raise NotConnectedException('Not Connected to Tumblr')
 
-        # Retrieve access_token from socialauth
-        access_token       = connected_accounts[0].extra_data['access_token']
-        access_token       = urlparse.parse_qs(access_token)
-        oauth_token        = access_token['oauth_token'][0]
-        oauth_token_secret = access_token['oauth_token_secret'][0]
-
-        return oauth_token, oauth_token_secret        
+        return token
 
 
 
@@ -123,7 +116,6 @@ class TumblrClient(OauthClient):
 
         if media:
             content = self._postOAuth(url, params)
-            content = content.read()
         else:
             body = urllib.urlencode(params)
             resp, content = self.client.request(url, "POST", body=body)
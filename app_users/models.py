@@ -1,13 +1,17 @@
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.forms.models import model_to_dict
 from settings import BASE_URL
 
-from social_auth.models import Association
+from social_auth.models import Association, UserSocialAuth
+from djangoappengine.db.utils import filter_in
+from djangotoolbox.db.utils import prefetch_related
+from respite.cache import bump_version
 from django.contrib.auth.models import User
 from app_projects.models_nn import Votes, Collaborations
 from app_users.countries import *
 from app_users.models_nn import CreativeFields
+from app_users.signals import profile_changed
 from app_socialnetworks.linkedin import LinkedInClient
 from app_socialnetworks.gravatar import GravatarClient
 from app_socialnetworks.oauthclient import NotConnectedException
@@ -132,7 +136,9 @@ class UserProfile(models.Model):
             - one list of connected accounts (provider, url)
             - one list of only names of the actually connected accounts
         """
-        connected_accounts_set = self.user.social_auth.filter(user=self.user.id)
+        connected_accounts_set = getattr(self, '_connected_accounts_cache', None)
+        if connected_accounts_set is None:
+            connected_accounts_set = self.user.social_auth.filter(user=self.user.id)
         connected_accounts     = []
         connected_names        = []
 
@@ -146,8 +152,7 @@ class UserProfile(models.Model):
                 connected_accounts.append({'provider':ca.provider, 'url':ca_url})
 
             elif ca.provider == 'linkedin':
-                l = LinkedInClient(self.user)
-                ca_url = "http://www.linkedin.com/x/profile/%s/%s" % (l.get_consumer_key(), ca.extra_data['id'])
+                ca_url = "http://www.linkedin.com/x/profile/%s/%s" % (LinkedInClient.CONSUMER_KEY, ca.extra_data['id'])
                 connected_accounts.append({'provider':ca.provider, 'url':ca_url})
 
             elif ca.provider == 'flickr':
@@ -196,14 +201,14 @@ class UserProfile(models.Model):
         Return the wrappers of all the projects onwned by the user
         """
         projects_own = self.get_projects_own()
-        return [x.wrapper() for x in projects_own]
+        return self._wrap_projects(projects_own)
 
     def get_projects_collaborate(self):
         """
         Return all the projects in which the user collaborate
         """
         projects_collaborate_set = Collaborations.objects.filter(userprofile=self)
-        projects_collaborate     = [x.project for x in projects_collaborate_set]
+        projects_collaborate     = self._get_projects([x.project_id for x in projects_collaborate_set])
         return projects_collaborate
 
     def get_projects_collaborate_wrapper(self):
@@ -211,21 +216,36 @@ class UserProfile(models.Model):
         Return the wrappers of all the projects in which the user collaborate
         """
         projects_collaborate = self.get_projects_collaborate()
-        return [x.wrapper() for x in projects_collaborate]
+        return self._wrap_projects(projects_collaborate)
 
     def get_projects_voted(self):
         """
         Return all the projects voted by the user
         """
         votes = Votes.objects.filter(user=self)
-        return [x.project for x in votes]
+        return self._get_projects([x.project_id for x in votes])
 
     def get_projects_voted_wrapper(self):
         """
         Return the wrappers of all the projects voted by the user
         """
-        votes = Votes.objects.filter(user=self)
-        return [x.wrapper() for x in votes]
+        projects_voted = self.get_projects_voted()
+        return self._wrap_projects(projects_voted)
+
+    def _get_projects(self, ids):
+        """
+        Fetch the projects with the given ids with a single batch get, preserving their order
+        """
+        from app_projects.models import Project
+        projects = Project.objects.in_bulk(ids)
+        return [projects[x] for x in ids if x in projects]
+
+    def _wrap_projects(self, projects):
+        """
+        Return the wrappers of the given projects
+        """
+        from app_projects.models import Project
+        return Project.wrap_many(projects)
 
 
     #=========================================================================
@@ -327,7 +347,9 @@ class UserProfile(models.Model):
         """
         Return the list of all the creative fields of the user
         """
-        fields_set      = CreativeFields.objects.filter(userprofile=self)
+        fields_set = getattr(self, '_creative_fields_cache', None)
+        if fields_set is None:
+            fields_set = CreativeFields.objects.filter(userprofile=self)
         creative_fields = [{'id': x.creative_field, 'name': x.get_creative_field()} for x in fields_set]
         return creative_fields
 
@@ -399,3 +421,87 @@ class UserProfile(models.Model):
         wrapper['creative_fields'] = self.get_creative_fields()
         
         return wrapper
+
+    @classmethod
+    def wrap_many(cls, profiles):
+        """
+        Return the wrappers of a list of `UserProfile` objects, resolving their 
+        users, employments, connected accounts and creative fields with batched queries
+
+        .. seealso:: :func:`wrapper`
+        """
+        profiles = list(profiles)
+        cls.prefetch(profiles)
+        return [x.wrapper() for x in profiles]
+
+    @classmethod
+    def prefetch(cls, profiles):
+        """
+        Fetch the data needed by :func:`wrapper` for all the profiles with batched queries,
+        and attach it to each `UserProfile` object (profiles already prefetched are skipped)
+        """
+        profiles = [x for x in profiles if not (hasattr(x, '_connected_accounts_cache') and hasattr(x, '_creative_fields_cache'))]
+        if not profiles:
+            return
+
+        # Users and employments (batch get by key)
+        prefetch_related(profiles, 'user', 'employment')
+
+        # Connected accounts and creative fields (batched IN queries)
+        connected_accounts = {}
+        for ca in sorted(filter_in(UserSocialAuth.objects.all(), 'user', set([x.user_id for x in profiles])), key=lambda x: x.pk):
+            connected_accounts.setdefault(ca.user_id, []).append(ca)
+
+        creative_fields = {}
+        for cf in sorted(filter_in(CreativeFields.objects.all(), 'userprofile', [x.id for x in profiles]), key=lambda x: x.pk):
+            creative_fields.setdefault(cf.userprofile_id, []).append(cf)
+
+        # Attach the prefetched data to the profiles
+        for u in profiles:
+            u._connected_accounts_cache  = connected_accounts.get(u.user_id, [])
+            u._creative_fields_cache     = creative_fields.get(u.id, [])
+
+
+
+#=========================================================================
+# MAINTENANCE
+#=========================================================================
+def _profiles_changed(ids):
+    """
+    Change the version of the profiles with the given ids and send :data:`app_users.signals.profile_changed`
+    """
+    for id in set(ids):
+        bump_version('userprofile', id)
+        profile_changed.send(sender=UserProfile, userprofile_id=id)
+
+def userprofile_changed_handler(sender, instance, **kwargs):
+    _profiles_changed([instance.id])
+post_save.connect(userprofile_changed_handler, sender=UserProfile)
+post_delete.connect(userprofile_changed_handler, sender=UserProfile)
+
+def user_changed_handler(sender, instance, **kwargs):
+    """
+    The username or the email of a user may have changed
+    """
+    _profiles_changed(UserProfile.objects.filter(user=instance).values_list('id', flat=True))
+post_save.connect(user_changed_handler, sender=User)
+
+def employment_changed_handler(sender, instance, **kwargs):
+    _profiles_changed(UserProfile.objects.filter(employment=instance).values_list('id', flat=True))
+post_save.connect(employment_changed_handler, sender=Employment)
+
+def creative_fields_changed_handler(sender, instance, **kwargs):
+    """
+    A creative field has been added to or removed from a user
+    """
+    _profiles_changed([instance.userprofile_id])
+post_save.connect(creative_fields_changed_handler, sender=CreativeFields)
+post_delete.connect(creative_fields_changed_handler, sender=CreativeFields)
+
+def connected_accounts_changed_handler(sender, instance, **kwargs):
+    """
+    A social network account has been connected to or disconnected from a user
+    """
+    _profiles_changed(UserProfile.objects.filter(user=instance.user_id).values_list('id', flat=True))
+post_save.connect(connected_accounts_changed_handler, sender=UserSocialAuth)
+post_delete.connect(connected_accounts_changed_handler, sender=UserSocialAuth)
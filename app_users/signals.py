@@ -0,0 +1,4 @@
+from django.dispatch import Signal
+
+# Sent when the data shown in the wrapper of a profile changes
+profile_changed = Signal(providing_args=['userprofile_id'])
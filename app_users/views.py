@@ -3,11 +3,14 @@ from django.contrib.auth.decorators import login_required
 from django.http import HttpResponseRedirect, HttpResponseForbidden
 from django.shortcuts import render_to_response, get_object_or_404, get_list_or_404
 from django.template import RequestContext
+from django.template.loader import render_to_string
 
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from django.views.generic.simple import direct_to_template
 
 from respite import Views
+from respite.cache import get_version, fragments_key, FRAGMENTS_TIMEOUT
 from respite.decorators import rest_login_required
 from respite.utils import generate_form
 
@@ -111,12 +114,21 @@ class UserProfileViews(Views):
         :Decorators: ``rest_login_required``
         :Rest Types: ``GET``
         :URL: ``^(?P<username>\w+)(?:/$|.(html|json)$)``
+
+        .. note:: the profile card is cached (see :func:`_show_fragments`)
         """
         username = str(username)
         u = get_object_or_404(UserProfile, user__username__iexact=username)
 
+        # Check if the user is trying to see its personal profile
+        if str(username) == str(request.user):
+            itself = True
+        else:
+            itself = False
+
         # Filter users
-        u_dict = u.wrapper()
+        fragments = self._show_fragments(request, u, itself)
+        u_dict = fragments['u']
 
         # Retrieve projects owned
         pj_own = u.get_projects_own_wrapper()
@@ -124,27 +136,58 @@ class UserProfileViews(Views):
         # Retrieve projects in which collaborate
         pj_col = u.get_projects_collaborate_wrapper()
 
-        # Check if the user is trying to see its personal profile
-        if str(username) == str(request.user):
-            itself = True
-        else:
-            itself = False
+        context = {
+            'messages': messages,
+            'errors': errors,
+            'u': u_dict,
+            'itself': itself,
+            'projects_own': pj_own,
+            'projects_collab': pj_col,
+        }
+
+        # Rendered fragments
+        if 'html' in fragments:
+            context['fragments'] = fragments['html']
 
         # Render the page    
         return self._render(
             request = request,
             template = 'user_view',
-            context = {
-                'messages': messages,
-                'errors': errors,
-                'u': u_dict,
-                'itself': itself,
-                'projects_own': pj_own,
-                'projects_collab': pj_col,
-            },
+            context = context,
             status = 200
         )
 
+    def _show_fragments(self, request, u, itself):
+        """
+        Return the parts of :func:`show` that only depend on the profile (and on whether the user is
+        looking at its own profile), from the cache if the profile didn't change since they were built
+        (see :mod:`respite.cache`)
+
+            - u: the wrapper of the profile
+            - html: the rendered `card` fragment of the page (html only)
+
+        .. note:: the cache is only populated by ``GET`` requests, as other requests may show
+                  the profile right after changing it
+        """
+        key       = fragments_key('userprofile', u.id, get_version('userprofile', u.id), itself)
+        fragments = cache.get(key) or {}
+        changed   = False
+
+        if 'u' not in fragments:
+            fragments['u'] = u.wrapper()
+            changed = True
+
+        format = self._get_format(request)
+        if format and format.extension == 'html' and 'html' not in fragments:
+            context = {'u': fragments['u'], 'itself': itself}
+            fragments['html'] = {'card': render_to_string('app_users/user_view_card.html', context)}
+            changed = True
+
+        if changed and request.method == 'GET':
+            cache.set(key, fragments, FRAGMENTS_TIMEOUT)
+
+        return fragments
+
 
     #=========================================================================
     # EDIT
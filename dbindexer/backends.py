@@ -8,6 +8,9 @@ from .lookups import StandardLookup
 
 OR = 'OR'
 
+# max number of filter signatures whose matching lookups are remembered
+MAX_MATCHING_LOOKUPS = 1000
+
 # TODO: optimize code
 class BaseResolver(object):
     def __init__(self):
@@ -15,10 +18,13 @@ class BaseResolver(object):
         self.index_map = {}
         # mapping from column names to field names
         self.column_to_name = {}
+        # mapping from filter signatures to the lookups matching them
+        self.matching_lookups = {}
 
     ''' API called by resolver'''
 
     def create_index(self, lookup):
+        self.matching_lookups.clear()
         field_to_index = self.get_field_to_index(lookup.model, lookup.field_name)
 
         # backend doesn't now how to handle this index definition
@@ -86,14 +92,13 @@ class BaseResolver(object):
         field_name = self.column_to_name.get(constraint.field.column)
         if field_name and constraint.alias == \
                 query.table_map[query.model._meta.db_table][0]:
-            for lookup in self.index_map.keys():
-                if lookup.matches_filter(query.model, field_name, lookup_type,
-                                         value):
-                    new_lookup_type, new_value = lookup.convert_lookup(value,
-                                                                       lookup_type)
-                    index_name = self.index_name(lookup)
-                    self._convert_filter(query, filters, child, index,
-                                         new_lookup_type, new_value, index_name)
+            for lookup in self.get_matching_lookups(query.model, field_name,
+                                                    lookup_type, value):
+                new_lookup_type, new_value = lookup.convert_lookup(value,
+                                                                   lookup_type)
+                index_name = self.index_name(lookup)
+                self._convert_filter(query, filters, child, index,
+                                     new_lookup_type, new_value, index_name)
 
     def _convert_filter(self, query, filters, child, index, new_lookup_type,
                         new_value, index_name):
@@ -104,6 +109,23 @@ class BaseResolver(object):
         child = constraint, lookup_type, annotation, value
         filters.children[index] = child
 
+    def get_matching_lookups(self, model, field_name, lookup_type, value):
+        '''Returns the lookups matching a filter. They only depend on the
+           value for regular expressions (which have their own indexes),
+           so they get cached per model, field and lookup type.'''
+
+        key = (model, field_name, lookup_type,
+               value if lookup_type in ('regex', 'iregex') else None)
+        lookups = self.matching_lookups.get(key)
+        if lookups is None:
+            lookups = [lookup for lookup in self.index_map.keys()
+                       if lookup.matches_filter(model, field_name, lookup_type,
+                                                value)]
+            if len(self.matching_lookups) >= MAX_MATCHING_LOOKUPS:
+                self.matching_lookups.clear()
+            self.matching_lookups[key] = lookups
+        return lookups
+
     def index_name(self, lookup):
         return lookup.index_name
 
@@ -205,15 +227,14 @@ class ConstantFieldJOINResolver(BaseResolver):
         if field_chain is None:
             return
 
-        for lookup in self.index_map.keys():
-            if lookup.matches_filter(query.model, field_chain, lookup_type,
-                                     value):
-                self.resolve_join(query, child)
-                new_lookup_type, new_value = lookup.convert_lookup(value,
-                                                                   lookup_type)
-                index_name = self.index_name(lookup)
-                self._convert_filter(query, filters, child, index,
-                                     new_lookup_type, new_value, index_name)
+        for lookup in self.get_matching_lookups(query.model, field_chain,
+                                                lookup_type, value):
+            self.resolve_join(query, child)
+            new_lookup_type, new_value = lookup.convert_lookup(value,
+                                                               lookup_type)
+            index_name = self.index_name(lookup)
+            self._convert_filter(query, filters, child, index,
+                                 new_lookup_type, new_value, index_name)
 
     def get_field_to_index(self, model, field_name):
         model = self.get_model_chain(model, field_name)[-1]
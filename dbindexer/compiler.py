@@ -1,4 +1,6 @@
 from .resolver import resolver
+from .watcher import watcher
+from django.db.utils import DatabaseError
 from django.utils.importlib import import_module
 
 def __repr__(self):
@@ -8,28 +10,65 @@ def __repr__(self):
 from django.db.models.sql.where import Constraint
 Constraint.__repr__ = __repr__
 
-# TODO: manipulate a copy of the query instead of the query itself. This has to
-# be done because the query can be reused afterwards by the user so that a
-# manipulated query can result in strange behavior for these cases!
-# TODO: Add watching layer which gives suggestions for indexes via query inspection
-# at runtime
-
 class BaseCompiler(object):
     def convert_filters(self):
-        resolver.convert_filters(self.query)
+        ''' Replaces the query of the compiler with a converted copy, leaving
+            the original one intact as it can be evaluated again. '''
+
+        self.original_query = self.query
+        joins = watcher.enabled and watcher.has_joins(self.query)
+        self.query = resolver.convert_query(self.query)
+        self.converted_state = dict(self.query.__dict__)
+        if not watcher.enabled:
+            return None
+
+        try:
+            ordering = self._get_ordering()
+        except DatabaseError:
+            ordering = ()
+        return watcher.get_shape(self.query, ordering, joins)
+
+    def update_original_query(self):
+        ''' Copies back the state the database backend left on the converted
+            query (e.g. cursors). '''
+
+        if self.query is self.original_query:
+            return
+        for name, value in self.query.__dict__.items():
+            if self.converted_state.get(name, self) is not value:
+                setattr(self.original_query, name, value)
 
 class SQLCompiler(BaseCompiler):
     def execute_sql(self, *args, **kwargs):
-        self.convert_filters()
-        return super(SQLCompiler, self).execute_sql(*args, **kwargs)
+        shape = self.convert_filters()
+        execute_sql = super(SQLCompiler, self).execute_sql
+        try:
+            if shape is None:
+                return execute_sql(*args, **kwargs)
+            return watcher.watch(shape, execute_sql, *args, **kwargs)
+        finally:
+            self.update_original_query()
 
     def results_iter(self):
-        self.convert_filters()
-        return super(SQLCompiler, self).results_iter()
+        shape = self.convert_filters()
+        results = super(SQLCompiler, self).results_iter()
+        if shape is not None:
+            results = watcher.watch_iter(shape, results)
+        try:
+            for result in results:
+                yield result
+        finally:
+            self.update_original_query()
 
     def has_results(self):
-        self.convert_filters()
-        return super(SQLCompiler, self).has_results()
+        shape = self.convert_filters()
+        has_results = super(SQLCompiler, self).has_results
+        try:
+            if shape is None:
+                return has_results()
+            return watcher.watch(shape, has_results)
+        finally:
+            self.update_original_query()
 
 
 class SQLInsertCompiler(BaseCompiler):
@@ -37,6 +76,12 @@ class SQLInsertCompiler(BaseCompiler):
         resolver.convert_insert_query(self.query)
         return super(SQLInsertCompiler, self).execute_sql(return_id=return_id)
 
+    def execute_sql_bulk(self, queries, return_id=False):
+        for query in queries:
+            resolver.convert_insert_query(query)
+        return super(SQLInsertCompiler, self).execute_sql_bulk(queries,
+            return_id=return_id)
+
 class SQLUpdateCompiler(BaseCompiler):
     pass
 
@@ -0,0 +1,56 @@
+"""
+A management command which prints the query shapes recorded by the
+dbindexer watcher (enabled by ``DBINDEXER_WATCH = True``), ranked by
+total time, with the composite indexes missing in index.yaml and the
+``register_index`` calls missing in the dbindexes modules.
+
+Run it with ``manage.py remote index_suggestions`` to read the
+statistics of the deployed app.
+
+"""
+
+import os
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import NoArgsCommand
+from django.utils.importlib import import_module
+
+from dbindexer.watcher import watcher
+
+
+class Command(NoArgsCommand):
+    help = "Suggest indexes for the queries recorded by the dbindexer watcher"
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--index-yaml', dest='index_yaml', default=None,
+            help='The index.yaml listing the existing composite indexes '
+                 '(defaults to the one next to the settings module)'),
+        make_option('--reset', action='store_true', dest='reset',
+            default=False,
+            help='Clear the recorded statistics after the report'),
+    )
+
+    def handle_noargs(self, **options):
+        path = options.get('index_yaml')
+        if path is None:
+            settings_module = import_module(settings.SETTINGS_MODULE)
+            path = os.path.join(os.path.dirname(settings_module.__file__),
+                                'index.yaml')
+        self.stdout.write(watcher.report(self.load_indexes(path)) + '\n')
+
+        if options.get('reset'):
+            watcher.reset()
+
+    def load_indexes(self, path):
+        try:
+            import yaml
+        except ImportError:
+            return ()
+        if not os.path.exists(path):
+            return ()
+        f = open(path)
+        try:
+            return (yaml.safe_load(f) or {}).get('indexes') or ()
+        finally:
+            f.close()
@@ -1,15 +1,23 @@
 from django.conf import settings
+from django.db.models.sql.constants import LHS_ALIAS, LHS_JOIN_COL, TABLE_NAME
 from django.utils.importlib import import_module
+from django.utils.tree import Node
 from django.core.exceptions import ImproperlyConfigured
 
+# max number of query signatures remembered as not needing a conversion
+MAX_UNCONVERTED = 1000
+
 class Resolver(object):
     def __init__(self):
         self.backends = []
+        # signatures of the queries no backend converts
+        self.unconverted = set()
         self.load_backends(getattr(settings, 'DBINDEXER_BACKENDS',
                                ('dbindexer.backends.BaseResolver',
                                 'dbindexer.backends.FKNullFix')))
 
     def load_backends(self, backend_paths):
+        self.unconverted.clear()
         for backend in backend_paths:
                 self.backends.append(self.load_backend(backend))
 
@@ -30,10 +38,67 @@ class Resolver(object):
         for backend in self.backends:
             backend.convert_filters(query)
 
+    def convert_query(self, query):
+        '''Returns a copy of query with its filters converted by the backends,
+           or query itself if none of them applies to its filters.
+
+           Conversions depend on the filter values (and the JOIN resolvers
+           run subqueries), so only the signatures of the queries left
+           unchanged get cached, to skip their conversion next time. The
+           other queries are converted again, but the backends cache the
+           lookups matching each filter.'''
+
+        signature = self.get_signature(query)
+        if signature in self.unconverted:
+            return query
+
+        converted = query.clone()
+        self.convert_filters(converted)
+        if self.get_signature(converted) != signature:
+            return converted
+
+        if len(self.unconverted) >= MAX_UNCONVERTED:
+            self.unconverted.clear()
+        self.unconverted.add(signature)
+        return query
+
     def create_index(self, lookup):
+        self.unconverted.clear()
         for backend in self.backends:
             backend.create_index(lookup)
 
+    def get_signature(self, query):
+        '''Returns what the backends look at to convert a query: the filtered
+           columns, their JOINs and their lookup types, but not the values
+           (other than regular expressions, which have their own indexes).'''
+
+        return (query.model, tuple(id(backend) for backend in self.backends),
+                self.get_where_signature(query, query.where))
+
+    def get_where_signature(self, query, filters):
+        children = []
+        for child in filters.children:
+            if isinstance(child, Node):
+                children.append(self.get_where_signature(query, child))
+                continue
+
+            constraint, lookup_type, annotation, value = child
+            if lookup_type not in ('regex', 'iregex'):
+                value = None
+            children.append((self.get_join_chain(query, constraint.alias),
+                             constraint.col, lookup_type, value))
+        return filters.connector, filters.negated, tuple(children)
+
+    def get_join_chain(self, query, alias):
+        chain = []
+        while alias:
+            join = query.alias_map.get(alias)
+            if join is None:
+                break
+            chain.append((join[TABLE_NAME], join[LHS_JOIN_COL]))
+            alias = join[LHS_ALIAS]
+        return tuple(chain)
+
     def convert_insert_query(self, query):
         for backend in self.backends:
             backend.convert_insert_query(query)
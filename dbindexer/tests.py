@@ -1,8 +1,10 @@
 from django.db import models
+from django.db.utils import DatabaseError
 from django.test import TestCase
 from .api import register_index
 from .lookups import StandardLookup
 from .resolver import resolver
+from .watcher import watcher
 from djangotoolbox.fields import ListField
 from datetime import datetime
 import re
@@ -26,6 +28,10 @@ class Indexed(models.Model):
 class NullableCharField(models.Model):
     name = models.CharField(max_length=500, null=True)
 
+class Watched(models.Model):
+    name = models.CharField(max_length=500)
+    age = models.IntegerField()
+
 # TODO: add test for foreign key with multiple filters via different and equal paths
 # to do so we have to create some entities matching equal paths but not matching
 # different paths
@@ -157,6 +163,40 @@ class TestIndexed(TestCase):
         self.assertEqual(1, len(ForeignIndexed.objects.all().filter(
             fk__name_fi2__endswith='bi')))
 
+    def test_query_reuse(self):
+        queryset = Indexed.objects.filter(name__iexact='itaChi')
+        self.assertEqual(1, queryset.count())
+        self.assertEqual(1, len(queryset))
+        self.assertEqual(1, len(queryset.all()))
+        # the original query keeps its lookups
+        self.assertEqual('iexact', queryset.query.where.children[0][1])
+
+        queryset = Indexed.objects.all().filter(foreignkey__title__iexact='biJuu')
+        self.assertEqual(4, len(queryset))
+        self.assertEqual(4, len(queryset.all()))
+        self.assertEqual(4, queryset.count())
+
+    def test_unconverted_cache(self):
+        queryset = Indexed.objects.filter(name='Neji')
+        self.assertEqual(1, queryset.count())
+        self.assertTrue(resolver.get_signature(queryset.query) in
+                        resolver.unconverted)
+        self.assertEqual(1, len(queryset))
+
+        queryset = Indexed.objects.filter(name__iexact='neji')
+        self.assertEqual(1, queryset.count())
+        self.assertFalse(resolver.get_signature(queryset.query) in
+                         resolver.unconverted)
+
+    def test_matching_lookups_cache(self):
+        backend = resolver.backends[0]
+        self.assertEqual(1, Indexed.objects.filter(name__iexact='neji').count())
+        cached = len(backend.matching_lookups)
+        # other values of the same filter reuse the matching lookups
+        self.assertEqual(1, Indexed.objects.filter(name__iexact='itaChi').count())
+        self.assertEqual(0, Indexed.objects.filter(name__iexact='kakashi').count())
+        self.assertEqual(cached, len(backend.matching_lookups))
+
     def test_fix_fk_isnull(self):
         self.assertEqual(0, len(Indexed.objects.filter(foreignkey=None)))
         self.assertEqual(4, len(Indexed.objects.exclude(foreignkey=None)))
@@ -214,6 +254,51 @@ class TestIndexed(TestCase):
         NullableCharField.objects.create()
 
 
+class TestWatcher(TestCase):
+    def setUp(self):
+        self.enabled = watcher.enabled
+        watcher.enabled = True
+        watcher.reset()
+
+        Watched(name='Kakashi', age=30).save()
+        Watched(name='Obito', age=31).save()
+
+    def tearDown(self):
+        watcher.reset()
+        watcher.enabled = self.enabled
+
+    def test_ranking(self):
+        self.assertEqual(1, len(Watched.objects.filter(name='Kakashi')))
+        self.assertEqual(1, len(Watched.objects.filter(name='Kakashi')))
+        self.assertEqual(1, Watched.objects.filter(age__gt=30).count())
+
+        ranking = watcher.get_ranking()
+        self.assertEqual(2, len(ranking))
+        stats = dict((str(shape), values) for shape, values in ranking)
+        queries, seconds, results, errors = \
+            stats['dbindexer.Watched WHERE name exact']
+        self.assertEqual((2, 2, 0), (queries, results, errors))
+        self.assertEqual(1, stats['dbindexer.Watched WHERE age gt'][0])
+
+    def test_suggestions(self):
+        self.assertEqual(1, len(Watched.objects.filter(
+            name='Kakashi').order_by('-age')))
+        self.assertRaises(DatabaseError, list, Watched.objects.filter(
+            name__iexact='kakashi'))
+
+        index = ('- kind: dbindexer_watched\n'
+                 '  properties:\n'
+                 '  - name: name\n'
+                 '  - name: age\n'
+                 '    direction: desc')
+        report = watcher.report()
+        self.assertTrue(index in report)
+        self.assertTrue("register_index(Watched, {'name': 'iexact'})" in report)
+
+        report = watcher.report([{'kind': 'dbindexer_watched', 'properties': [
+            {'name': 'name'}, {'name': 'age', 'direction': 'desc'}]}])
+        self.assertFalse(index in report)
+
 #    def test_contains(self):
 #        # passes on production but not on gae-sdk (development)
 #        self.assertEqual(1, len(Indexed.objects.all().filter(name__contains='Aim')))
@@ -0,0 +1,354 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import get_models
+from django.db.models.sql.constants import LHS_ALIAS, LHS_JOIN_COL, TABLE_NAME
+from django.utils.tree import Node
+from djangotoolbox.fields import ListField
+from .resolver import resolver
+
+# lookups the datastore can't serve without a dbindexer index
+INDEXED_LOOKUPS = ('iexact', 'contains', 'icontains', 'endswith', 'iendswith',
+                   'istartswith', 'regex', 'iregex', 'month', 'day',
+                   'week_day')
+
+# lookups translated to inequality filters by the datastore
+INEQUALITY_LOOKUPS = ('gt', 'gte', 'lt', 'lte', 'startswith', 'range', 'year')
+
+FLUSH_INTERVAL = 60
+CACHE_KEY = 'dbindexer:watcher'
+CACHE_TIMEOUT = 7 * 24 * 60 * 60
+
+class Leaf(tuple):
+    ''' A filter of a watched query: (field_chain, column, lookup_type,
+        negated, join, list_index). '''
+
+    field_chain = property(lambda self: self[0])
+    column = property(lambda self: self[1])
+    lookup_type = property(lambda self: self[2])
+    negated = property(lambda self: self[3])
+    # the filter still spans a relation after the conversion
+    join = property(lambda self: self[4])
+    # the filter was converted to a dbindexer ListField index
+    list_index = property(lambda self: self[5])
+
+class QueryShape(tuple):
+    ''' The shape of a converted query: (model, leaves, ordering, joins),
+        joins telling whether dbindexer resolved JOINs (in memory or via
+        constant fields) to convert it. '''
+
+    model = property(lambda self: self[0])
+    leaves = property(lambda self: self[1])
+    ordering = property(lambda self: self[2])
+    joins = property(lambda self: self[3])
+
+    @property
+    def list_index(self):
+        return any(leaf.list_index for leaf in self.leaves)
+
+    def __str__(self):
+        filters = ', '.join('%s%s %s' % (leaf.negated and 'NOT ' or '',
+                                          leaf.field_chain, leaf.lookup_type)
+                            for leaf in self.leaves)
+        ordering = ', '.join('%s%s' % (not ascending and '-' or '', column)
+                             for column, ascending in self.ordering)
+        result = '%s.%s' % (self.model._meta.app_label,
+                            self.model._meta.object_name)
+        if filters:
+            result += ' WHERE %s' % filters
+        if ordering:
+            result += ' ORDER BY %s' % ordering
+        if self.joins:
+            result += ' [JOIN]'
+        if self.list_index:
+            result += ' [ListField index]'
+        return result
+
+class QueryWatcher(object):
+    ''' Records the shape, latency and result count of converted queries,
+        aggregating them in memory and flushing them to the cache every
+        FLUSH_INTERVAL seconds, to suggest the missing indexes. '''
+
+    def __init__(self):
+        self.enabled = getattr(settings, 'DBINDEXER_WATCH', False)
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.last_flush = time.time()
+
+    ''' API called by the compilers '''
+
+    def has_joins(self, query):
+        return any(self.get_lhs_alias(query, child[0].alias)
+                   for _, child in self.get_leaves(query.where)
+                   if child[0].field is not None)
+
+    def get_shape(self, query, ordering, joins):
+        leaves = []
+        for negated, child in self.get_leaves(query.where):
+            constraint, lookup_type, annotation, value = child
+            if constraint.field is None:
+                continue
+            # field__isnull=False is handled as NOT field__isnull=True
+            if lookup_type == 'isnull' and not annotation:
+                negated = not negated
+            leaves.append(Leaf((self.get_field_chain(query, constraint),
+                                constraint.col, lookup_type, negated,
+                                bool(self.get_lhs_alias(query,
+                                                        constraint.alias)),
+                                self.is_list_index(constraint.field))))
+        if isinstance(ordering, bool):
+            ordering = ()
+        ordering = tuple((field.column, ascending)
+                         for field, ascending in ordering)
+        return QueryShape((query.model, tuple(sorted(leaves)), ordering,
+                           joins))
+
+    def watch(self, shape, func, *args, **kwargs):
+        ''' Calls func, recording its latency for shape. '''
+
+        start = time.time()
+        try:
+            result = func(*args, **kwargs)
+        except:
+            self.record(shape, time.time() - start, 0, error=True)
+            raise
+        self.record(shape, time.time() - start, 0)
+        return result
+
+    def watch_iter(self, shape, results):
+        ''' Yields results, recording the time spent fetching them. '''
+
+        count = 0
+        elapsed = 0.0
+        results = iter(results)
+        while True:
+            start = time.time()
+            try:
+                result = results.next()
+            except StopIteration:
+                elapsed += time.time() - start
+                break
+            except:
+                self.record(shape, elapsed + time.time() - start, count,
+                            error=True)
+                raise
+            elapsed += time.time() - start
+            count += 1
+            yield result
+        self.record(shape, elapsed, count)
+
+    def record(self, shape, elapsed, results, error=False):
+        self.lock.acquire()
+        try:
+            stats = self.stats.setdefault(shape, [0, 0.0, 0, 0])
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] += results
+            stats[3] += int(error)
+            flush = time.time() - self.last_flush > FLUSH_INTERVAL
+        finally:
+            self.lock.release()
+        if flush:
+            self.flush()
+
+    ''' Reporting API '''
+
+    def flush(self):
+        ''' Merges the statistics recorded in memory into the cached ones,
+            which aggregate those of all the processes. Concurrent flushes
+            may lose some records, this is just meant to give hints. '''
+
+        self.lock.acquire()
+        try:
+            stats, self.stats = self.stats, {}
+            self.last_flush = time.time()
+        finally:
+            self.lock.release()
+        if not stats:
+            return
+
+        merged = self.load()
+        for shape, values in stats.items():
+            previous = merged.get(shape, [0, 0.0, 0, 0])
+            merged[shape] = [a + b for a, b in zip(previous, values)]
+        cache.set(CACHE_KEY, self.dump(merged), CACHE_TIMEOUT)
+
+    def load(self):
+        models = dict(('%s.%s' % (model._meta.app_label,
+                                  model._meta.object_name), model)
+                      for model in get_models())
+        result = {}
+        for (label, leaves, ordering, joins), values in \
+                (cache.get(CACHE_KEY) or {}).items():
+            if label in models:
+                shape = QueryShape((models[label],
+                                    tuple(Leaf(leaf) for leaf in leaves),
+                                    ordering, joins))
+                result[shape] = values
+        return result
+
+    def dump(self, stats):
+        # models can't be pickled, store their labels
+        return dict((('%s.%s' % (shape.model._meta.app_label,
+                                 shape.model._meta.object_name),
+                      tuple(tuple(leaf) for leaf in shape.leaves),
+                      shape.ordering, shape.joins), values)
+                    for shape, values in stats.items())
+
+    def reset(self):
+        self.lock.acquire()
+        try:
+            self.stats = {}
+        finally:
+            self.lock.release()
+        cache.delete(CACHE_KEY)
+
+    def get_ranking(self):
+        ''' Returns (shape, [queries, seconds, results, errors]) tuples,
+            from the shape queries spent most time on. '''
+
+        self.flush()
+        return sorted(self.load().items(), key=lambda item: -item[1][1])
+
+    def report(self, existing_indexes=()):
+        ''' Returns a text report of the watched query shapes, of the
+            composite indexes missing in index.yaml and of the
+            register_index calls missing in the dbindexes modules.
+
+            existing_indexes is a list of index.yaml-style dicts. '''
+
+        existing = set(self.index_key(index['kind'], [
+                           (prop['name'], prop.get('direction', 'asc') == 'asc')
+                           for prop in index.get('properties', ())])
+                       for index in existing_indexes)
+        ranking = self.get_ranking()
+
+        lines = ['Query shapes by total time:']
+        for shape, (queries, seconds, results, errors) in ranking:
+            lines.append('%9.3fs %6d queries %8d results %4d errors  %s' %
+                         (seconds, queries, results, errors, shape))
+
+        lines.extend(['', 'Missing composite indexes (index.yaml):'])
+        suggested = set()
+        for shape, values in ranking:
+            properties = self.suggest_index(shape)
+            if properties is None:
+                continue
+            key = self.index_key(shape.model._meta.db_table, properties)
+            if key in existing or key in suggested:
+                continue
+            suggested.add(key)
+            lines.extend(['', '- kind: %s' % shape.model._meta.db_table,
+                          '  properties:'])
+            for column, ascending in properties:
+                lines.append('  - name: %s' % column)
+                if not ascending:
+                    lines.append('    direction: desc')
+
+        lines.extend(['', 'Missing lookup indexes (dbindexes.py):'])
+        suggested = set()
+        for shape, values in ranking:
+            for field_chain, lookup in self.suggest_lookups(shape):
+                if (shape.model, field_chain, lookup) in suggested:
+                    continue
+                suggested.add((shape.model, field_chain, lookup))
+                lines.append("register_index(%s, {'%s': %s})" % (
+                    shape.model._meta.object_name, field_chain, lookup))
+        return '\n'.join(lines)
+
+    ''' helper methods '''
+
+    def suggest_index(self, shape):
+        ''' Returns the (column, ascending) properties of the composite
+            index the datastore needs for shape, or None if its built-in
+            indexes are enough. '''
+
+        pk_column = shape.model._meta.pk.column
+        equalities, inequality = [], None
+        for leaf in shape.leaves:
+            if leaf.column == pk_column or leaf.join:
+                continue
+            if leaf.lookup_type in INEQUALITY_LOOKUPS or leaf.negated:
+                inequality = inequality or leaf.column
+            elif leaf.column not in equalities:
+                equalities.append(leaf.column)
+
+        # sorting on properties filtered for equality is a no-op
+        ordering = [(column, ascending) for column, ascending in shape.ordering
+                    if column != pk_column and column not in equalities]
+        if inequality and (not ordering or ordering[0][0] != inequality):
+            ordering.insert(0, (inequality, True))
+
+        # queries filtering for equality only use merge-joins
+        properties = [(column, True) for column in sorted(equalities)] + \
+            ordering
+        if len(properties) < 2 or not ordering:
+            return None
+        return properties
+
+    def suggest_lookups(self, shape):
+        for leaf in shape.leaves:
+            if leaf.lookup_type in INDEXED_LOOKUPS:
+                yield leaf.field_chain, "'%s'" % leaf.lookup_type
+            elif leaf.join:
+                yield leaf.field_chain, "(StandardLookup(), '%s')" % \
+                    leaf.lookup_type
+
+    def index_key(self, kind, properties):
+        return kind, tuple(properties)
+
+    def get_leaves(self, filters, negated=False):
+        negated = negated != bool(filters.negated)
+        leaves = []
+        for child in filters.children:
+            if isinstance(child, Node):
+                leaves.extend(self.get_leaves(child, negated))
+            else:
+                leaves.append((negated, child))
+        return leaves
+
+    def get_lhs_alias(self, query, alias):
+        join = query.alias_map.get(alias)
+        return join and join[LHS_ALIAS]
+
+    def get_field_chain(self, query, constraint):
+        # joins trimmed by Django leave the target's primary key as field
+        field = constraint.field
+        model = query.model
+        if constraint.col != field.column:
+            field = self.get_field_by_column(model, constraint.col) or field
+
+        names = [field.name]
+        alias = constraint.alias
+        while self.get_lhs_alias(query, alias):
+            lhs_alias = self.get_lhs_alias(query, alias)
+            lhs_model = self.get_model(query.alias_map[lhs_alias][TABLE_NAME])
+            lhs_field = self.get_field_by_column(
+                lhs_model, query.alias_map[alias][LHS_JOIN_COL])
+            if lhs_field is None:
+                break
+            names.append(lhs_field.name)
+            alias = lhs_alias
+        return '__'.join(reversed(names))
+
+    def get_model(self, db_table):
+        for model in get_models():
+            if model._meta.db_table == db_table:
+                return model
+
+    def get_field_by_column(self, model, column):
+        if model is None:
+            return None
+        for field in model._meta.fields:
+            if field.column == column:
+                return field
+
+    def is_list_index(self, field):
+        for backend in resolver.backends:
+            if field in getattr(backend, 'index_map', {}).values():
+                return isinstance(field, ListField)
+        return False
+
+watcher = QueryWatcher()
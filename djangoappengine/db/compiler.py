@@ -1,4 +1,6 @@
+import datetime
 from functools import wraps
+import heapq
 import sys
 
 from django.db.models.fields import AutoField
@@ -11,7 +13,8 @@ from django.utils.tree import Node
 from google.appengine.api.datastore import Entity, Query, MultiQuery, \
     Put, Get, Delete
 from google.appengine.api.datastore_errors import Error as GAEError
-from google.appengine.api.datastore_types import Key, Text
+from google.appengine.api.datastore_types import Key, Text, \
+    RestoreFromIndexValue
 
 from djangotoolbox.db.basecompiler import (
     NonrelQuery,
@@ -22,7 +25,7 @@ from djangotoolbox.db.basecompiler import (
 
 from .db_settings import get_model_indexes
 from .expressions import ExpressionEvaluator
-from .utils import commit_locked
+from .utils import commit_locked, get_query_option
 
 
 # Valid query types (a dictionary is used for speedy lookups).
@@ -41,6 +44,27 @@ OPERATORS_MAP = {
     'year': None,
 }
 
+# Max number of entities stored by a single multi-entity Put.
+MAX_PUT_ENTITIES = 500
+
+# Number of keys fetched by each round-trip when counting.
+COUNT_BATCH_SIZE = 1000
+
+# Field db_types that are never indexed, thus can't be projected.
+UNPROJECTABLE_DB_TYPES = ('text', 'longtext', 'bytes', 'list', 'set', 'dict')
+
+# Projection queries return values straight from the indexes, where
+# strings are stored as byte strings and date / time values (saved as
+# datetimes) as integers; these are the types they have to be restored
+# to, other indexed values come back unchanged.
+PROJECTION_TYPES = {
+    'string': unicode,
+    'decimal': unicode,
+    'date': datetime.datetime,
+    'datetime': datetime.datetime,
+    'time': datetime.datetime,
+}
+
 # GAE filters used for negated Django lookups.
 NEGATION_MAP = {
     'gt': '<=',
@@ -89,10 +113,12 @@ class GAEQuery(NonrelQuery):
         self.ordering = []
         self.db_table = self.query.get_meta().db_table
         self.pks_only = (len(fields) == 1 and fields[0].primary_key)
-        start_cursor = getattr(self.query, '_gae_start_cursor', None)
-        end_cursor = getattr(self.query, '_gae_end_cursor', None)
+        self.start_cursor = getattr(self.query, '_gae_start_cursor', None)
+        self.end_cursor = getattr(self.query, '_gae_end_cursor', None)
+        self.projection = self._get_projection(fields)
         self.gae_query = [Query(self.db_table, keys_only=self.pks_only,
-                                cursor=start_cursor, end_cursor=end_cursor)]
+                                cursor=self.start_cursor,
+                                end_cursor=self.end_cursor)]
 
     # This is needed for debugging.
     def __repr__(self):
@@ -136,10 +162,12 @@ class GAEQuery(NonrelQuery):
 
     @safe_call
     def count(self, limit=NOT_PROVIDED):
+        if get_query_option(self.query, 'approximate_count', False):
+            return self._count_approximate(limit)
         if self.included_pks is not None:
-            return len(self.get_matching_pk(0, limit))
+            return self._count_included_pks(limit)
         if self.excluded_pks:
-            return len(list(self.fetch(0, 2000)))
+            return self._count_keys(limit)
         # The datastore's Count() method has a 'limit' kwarg, which has
         # a default value (obviously).  This value can be overridden to
         # anything you like, and importantly can be overridden to
@@ -297,18 +325,122 @@ class GAEQuery(NonrelQuery):
                 combined.append(self.gae_query[0])
         self.gae_query = combined
 
+    def _get_projection(self, fields):
+        """
+        Returns the (column, db_type) pairs to project the query on, if
+        it was requested through the "projection" query option and all
+        the fields are indexed single-valued properties, or None to load
+        the whole entities.
+        """
+        if self.pks_only or not get_query_option(self.query, 'projection',
+                                                 False):
+            return None
+        unindexed = get_model_indexes(self.query.model)['unindexed']
+        projection = []
+        for field in fields:
+            if field.primary_key:
+                continue
+            db_type = self.connection.creation.db_type(field)
+            if db_type in UNPROJECTABLE_DB_TYPES or field.name in unindexed:
+                return None
+            projection.append((field.column, db_type))
+        return projection or None
+
+    def _copy_query(self, query, **kwargs):
+        copy = Query(self.db_table, cursor=self.start_cursor,
+                     end_cursor=self.end_cursor, **kwargs)
+        copy.update(query)
+        return copy
+
     def _make_entity(self, entity):
         if isinstance(entity, Key):
             key = entity
             entity = {}
         else:
             key = entity.key()
+            # Batch-gotten entities are whole, even if projected.
+            if self.projection is not None and self.included_pks is None:
+                entity = dict(entity)
+                for column, db_type in self.projection:
+                    data_type = PROJECTION_TYPES.get(db_type)
+                    value = entity.get(column)
+                    if data_type is not None and value is not None:
+                        entity[column] = RestoreFromIndexValue(value,
+                                                               data_type)
 
         entity[self.query.get_meta().pk.column] = key
         return entity
 
+    def _build_keys_query(self):
+        queries = [self._copy_query(query, keys_only=True)
+                   for query in self.gae_query]
+        if len(queries) > 1:
+            return MultiQuery(queries, [])
+        return queries[0]
+
+    def _count_keys(self, limit):
+        # Stream the matching keys in batches, skipping the excluded
+        # ones, without any cap but the requested limit.
+        if limit is NOT_PROVIDED:
+            limit = None
+        excluded_pks = set(self.excluded_pks)
+        count = 0
+        for key in self._build_keys_query().Run(batch_size=COUNT_BATCH_SIZE):
+            if key in excluded_pks:
+                continue
+            count += 1
+            if limit is not None and count >= limit:
+                break
+        return count
+
+    def _count_included_pks(self, limit):
+        # A batch get is the cheapest way to check which keys exist
+        # (keys-only queries would need a sub-query per key), but the
+        # entities are only checked against the filters, not converted.
+        if limit is NOT_PROVIDED:
+            limit = None
+        keys = []
+        for key in self.included_pks:
+            if key not in keys:
+                keys.append(key)
+        count = 0
+        for i in range(0, len(keys), COUNT_BATCH_SIZE):
+            for entity in Get(keys[i:i + COUNT_BATCH_SIZE]):
+                if entity is not None and self.matches_filters(entity):
+                    count += 1
+                    if limit is not None and count >= limit:
+                        return count
+        return count
+
+    def _count_approximate(self, limit):
+        if self.included_pks is not None:
+            count = len(set(self.included_pks))
+        elif (len(self.gae_query) == 1 and not self.gae_query[0] and
+              self.start_cursor is None and self.end_cursor is None):
+            stats = Query('__Stat_Kind__',
+                          {'kind_name =': self.db_table}).Get(1)
+            if stats:
+                count = stats[0]['count']
+            else:
+                count = self._build_keys_query().Count(limit=None)
+        else:
+            count = self._build_keys_query().Count(limit=None)
+        if limit is not NOT_PROVIDED and limit is not None:
+            count = min(count, limit)
+        return count
+
     @safe_call
     def _build_query(self):
+        if self.projection is not None:
+            # Properties used in equality filters can't be projected.
+            columns = [column for column, db_type in self.projection]
+            if any('%s =' % column in query
+                   for query in self.gae_query for column in columns):
+                self.projection = None
+            else:
+                self.gae_query = [self._copy_query(query,
+                                                   projection=columns)
+                                  for query in self.gae_query]
         for query in self.gae_query:
             query.Order(*self.ordering)
         if len(self.gae_query) > 1:
@@ -322,19 +454,23 @@ class GAEQuery(NonrelQuery):
                    if result is not None and
                        self.matches_filters(result)]
         if self.ordering:
-            results.sort(cmp=self.order_pk_filtered)
-        if high_mark is not None and high_mark < len(results) - 1:
+            sort_key = self._make_sort_key(self._get_value_getter)
+            if high_mark is not None and high_mark < len(results):
+                results = heapq.nsmallest(high_mark, results, key=sort_key)
+            else:
+                results.sort(key=sort_key)
+        if high_mark is not None:
             results = results[:high_mark]
         if low_mark:
             results = results[low_mark:]
         return results
 
-    def order_pk_filtered(self, lhs, rhs):
-        left = dict(lhs)
-        left[self.query.get_meta().pk.column] = lhs.key().to_path()
-        right = dict(rhs)
-        right[self.query.get_meta().pk.column] = rhs.key().to_path()
-        return self._order_in_memory(left, right)
+    def _get_value_getter(self, field):
+        # Keys are compared by their paths, as on the datastore.
+        if field.primary_key:
+            return lambda entity: entity.key().to_path()
+        column = field.column
+        return lambda entity: entity.get(column)
 
     def matches_filters(self, entity):
         """
@@ -357,8 +493,24 @@ class SQLInsertCompiler(NonrelInsertCompiler, SQLCompiler):
 
     @safe_call
     def insert(self, data, return_id=False):
+        unindexed_fields = set(
+            get_model_indexes(self.query.model)['unindexed'])
+        return Put(self._build_entity(data, unindexed_fields))
+
+    @safe_call
+    def insert_bulk(self, rows, return_id=False):
+        # Store the entities with multi-entity puts, in chunks of at
+        # most MAX_PUT_ENTITIES.
+        unindexed_fields = set(
+            get_model_indexes(self.query.model)['unindexed'])
+        keys = []
+        for i in range(0, len(rows), MAX_PUT_ENTITIES):
+            keys.extend(Put([self._build_entity(data, unindexed_fields)
+                             for data in rows[i:i + MAX_PUT_ENTITIES]]))
+        return keys
+
+    def _build_entity(self, data, unindexed_fields):
         opts = self.query.get_meta()
-        unindexed_fields = get_model_indexes(self.query.model)['unindexed']
         kwds = {'unindexed_properties': []}
         properties = {}
         for field, value in data.iteritems():
@@ -380,12 +532,13 @@ class SQLInsertCompiler(NonrelInsertCompiler, SQLCompiler):
             else:
                 properties[field.column] = value
 
-            if field in unindexed_fields:
+            # Unindexed fields are configured by name.
+            if field.name in unindexed_fields:
                 kwds['unindexed_properties'].append(field.column)
 
         entity = Entity(opts.db_table, **kwds)
         entity.update(properties)
-        return Put(entity)
+        return entity
 
 
 class SQLUpdateCompiler(NonrelUpdateCompiler, SQLCompiler):
@@ -396,13 +549,31 @@ class SQLUpdateCompiler(NonrelUpdateCompiler, SQLCompiler):
         pk_field = self.query.model._meta.pk
         self.query.add_immediate_loading([pk_field.name])
         pks = [row for row in self.results_iter()]
-        self.update_entities(pks, pk_field)
+        if get_query_option(self.query, 'transactional_update', False):
+            self.update_entities(pks, pk_field)
+        else:
+            self.update_entities_batch(pks, pk_field)
         return len(pks)
 
     def update_entities(self, pks, pk_field):
         for pk in pks:
             self.update_entity(pk[0], pk_field)
 
+    def update_entities_batch(self, pks, pk_field):
+        # Get, update and put the entities in chunks, without
+        # transactions.
+        gae_query = self.build_query()
+        for i in range(0, len(pks), MAX_PUT_ENTITIES):
+            keys = [self.ops.value_for_db(pk[0], pk_field)
+                    for pk in pks[i:i + MAX_PUT_ENTITIES]]
+            entities = [entity for entity in Get(keys)
+                        if entity is not None and
+                           gae_query.matches_filters(entity)]
+            for entity in entities:
+                self.update_values(entity)
+            if entities:
+                Put(entities)
+
     @commit_locked
     def update_entity(self, pk, pk_field):
         gae_query = self.build_query()
@@ -411,6 +582,10 @@ class SQLUpdateCompiler(NonrelUpdateCompiler, SQLCompiler):
         if not gae_query.matches_filters(entity):
             return
 
+        self.update_values(entity)
+        Put(entity)
+
+    def update_values(self, entity):
         for field, _, value in self.query.values:
             if hasattr(value, 'prepare_database_save'):
                 value = value.prepare_database_save(field)
@@ -429,8 +604,6 @@ class SQLUpdateCompiler(NonrelUpdateCompiler, SQLCompiler):
 
             entity[field.column] = self.ops.value_for_db(value, field)
 
-        Put(entity)
-
 
 class SQLDeleteCompiler(NonrelDeleteCompiler, SQLCompiler):
     pass
@@ -40,6 +40,87 @@ def set_cursor(queryset, start=None, end=None):
     return queryset
 
 
+class QueryOptionsMixin(object):
+
+    def clone(self, *args, **kwargs):
+        kwargs['_gae_options'] = dict(getattr(self, '_gae_options', {}))
+        return super(QueryOptionsMixin, self).clone(*args, **kwargs)
+
+
+def set_query_option(queryset, name, value):
+    """
+    Returns a copy of the queryset carrying a back-end specific option,
+    which survives the clones of its query.
+    """
+    queryset = queryset.all()
+
+    if QueryOptionsMixin not in queryset.query.__class__.__bases__:
+        class OptionsQuery(QueryOptionsMixin, queryset.query.__class__):
+            pass
+        queryset.query = queryset.query.clone(klass=OptionsQuery)
+
+    options = dict(getattr(queryset.query, '_gae_options', {}))
+    options[name] = value
+    queryset.query._gae_options = options
+    return queryset
+
+
+def get_query_option(query, name, default=None):
+    return getattr(query, '_gae_options', {}).get(name, default)
+
+
+def transactional_update(queryset):
+    """
+    Returns a copy of the queryset whose update() gets, re-checks and
+    puts each entity in its own transaction, instead of updating the
+    entities in batches. Use it when concurrent updates must not be
+    lost, e.g. for F() increments.
+    """
+    return set_query_option(queryset, 'transactional_update', True)
+
+
+def approximate_count(queryset):
+    """
+    Returns a copy of the queryset whose count() needs a single RPC and
+    never decodes entities, at the price of precision: kind statistics
+    (refreshed about once a day) are used for unfiltered queries, and
+    excluded primary keys are not subtracted. Meant for UI badges.
+    """
+    return set_query_option(queryset, 'approximate_count', True)
+
+
+def projection(queryset):
+    """
+    Returns a copy of the queryset whose values(), values_list() and
+    only() field lists are served by a projection query, read from the
+    indexes without loading the entities. The fields must be indexed
+    and single-valued (the whole entities are loaded otherwise), must
+    not be compared for equality in filters, and a composite index
+    covering them (and the filters / ordering) is needed; entities
+    lacking any of the properties are not returned.
+    """
+    return set_query_option(queryset, 'projection', True)
+
+
+# GAE runs a sub-query for each value of an __in filter and allows at
+# most 30 of them.
+MAX_IN_VALUES = 30
+
+
+def filter_in(queryset, field_name, values):
+    """
+    Returns a list with the objects of the queryset whose field is in
+    values, splitting values in batches of MAX_IN_VALUES to respect the
+    limit on the number of sub-queries.
+    """
+    values = list(values)
+    results = []
+    for i in range(0, len(values), MAX_IN_VALUES):
+        lookup = {'%s__in' % field_name: values[i:i + MAX_IN_VALUES]}
+        results.extend(queryset.filter(**lookup))
+    return results
+
+
 def commit_locked(func_or_using=None, retries=None, xg=False):
     """
     Decorator that locks rows on DB reads.
@@ -1,4 +1,5 @@
 from .backend import BackendTest
+from .bulk import BulkInsertTest
 from .field_db_conversion import FieldDBConversionTest
 from .field_options import FieldOptionsTest
 from .filter import FilterTest
@@ -0,0 +1,62 @@
+from django.db import models
+from django.test import TestCase
+
+from djangotoolbox.db.utils import bulk_create
+
+from google.appengine.api.datastore import Get, Key
+
+from ..db.db_settings import get_indexes
+
+
+class BulkModel(models.Model):
+    number = models.IntegerField()
+    text = models.TextField()
+
+
+get_indexes()[BulkModel] = {'unindexed': ('number',)}
+
+
+class BulkKeyModel(models.Model):
+    id = models.CharField(primary_key=True, max_length=10)
+    number = models.IntegerField()
+
+
+class BulkInsertTest(TestCase):
+
+    def test_keys_in_order(self):
+        objs = bulk_create([BulkModel(number=i, text='t%d' % i)
+                            for i in range(10)])
+        self.assertEqual(BulkModel.objects.count(), 10)
+        for obj in objs:
+            self.assertEqual(BulkModel.objects.get(pk=obj.pk).text,
+                             obj.text)
+
+    def test_chunks(self):
+        from ..db import compiler
+        max_put_entities = compiler.MAX_PUT_ENTITIES
+        compiler.MAX_PUT_ENTITIES = 3
+        try:
+            objs = bulk_create([BulkModel(number=i, text='')
+                                for i in range(7)])
+        finally:
+            compiler.MAX_PUT_ENTITIES = max_put_entities
+        self.assertEqual(len(set([obj.pk for obj in objs])), 7)
+        self.assertEqual(
+            [BulkModel.objects.get(pk=obj.pk).number for obj in objs],
+            range(7))
+
+    def test_given_keys(self):
+        bulk_create([BulkKeyModel(id='k%d' % i, number=i) for i in range(3)])
+        self.assertEqual(BulkKeyModel.objects.get(pk='k2').number, 2)
+
+    def test_unindexed(self):
+        obj = bulk_create([BulkModel(number=1, text='')])[0]
+        entity = Get(Key.from_path(BulkModel._meta.db_table, obj.pk))
+        self.assertEqual(entity.unindexed_properties(), frozenset(['number']))
+
+    def test_saved_state(self):
+        obj = bulk_create([BulkModel(number=1, text='')])[0]
+        obj.number = 2
+        obj.save()
+        self.assertEqual(BulkModel.objects.count(), 1)
+        self.assertEqual(BulkModel.objects.get(pk=obj.pk).number, 2)
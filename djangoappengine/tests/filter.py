@@ -9,7 +9,7 @@ from django.utils import unittest
 
 from google.appengine.api.datastore import Get, Key
 
-from ..db.utils import get_cursor, set_cursor
+from ..db.utils import get_cursor, set_cursor, projection
 from .testmodels import FieldsWithOptionsModel, EmailModel, DateTimeModel, \
     OrderedModel, BlobModel
 
@@ -414,6 +414,46 @@ class FilterTest(TestCase):
                 .filter(integer__gt=3).order_by('integer').values_list('pk')],
             ['app-engine@scholardocs.com', 'rinnengan@sage.de'])
 
+    def test_projection(self):
+        self.assertEquals(
+            [entity['integer'] for entity in projection(
+                FieldsWithOptionsModel.objects.filter(integer__gt=3)
+                .order_by('integer')).values('integer')],
+            [5, 9])
+
+        # Strings and times are restored from their index values.
+        self.assertEquals(
+            list(projection(FieldsWithOptionsModel.objects
+                .order_by('floating_point'))
+                .values_list('floating_point', 'slug')),
+            [(1.58, u'GAGAA'), (2.6, u'GAGAA'), (5.3, u'GAGAA'),
+             (9.1, u'GAGAA')])
+        self.assertEquals(
+            [entity.time for entity in projection(FieldsWithOptionsModel
+                .objects.filter(integer__gt=8)).only('time')],
+            [self.last_save_time])
+
+        # Fields filtered for equality or not indexed are loaded from
+        # the entities.
+        self.assertEquals(
+            list(projection(FieldsWithOptionsModel.objects
+                .filter(integer=5)).values_list('integer', flat=True)),
+            [5])
+        self.assertEquals(
+            [len(text) for text in projection(FieldsWithOptionsModel.objects
+                .filter(integer=5)).values_list('long_text', flat=True)],
+            [1000])
+
+    def test_exists(self):
+        self.assertTrue(
+            FieldsWithOptionsModel.objects.filter(integer=5).exists())
+        self.assertFalse(
+            FieldsWithOptionsModel.objects.filter(integer=6).exists())
+        self.assertTrue(FieldsWithOptionsModel.objects.filter(
+            pk='rinnengan@sage.de').exists())
+        self.assertFalse(FieldsWithOptionsModel.objects.filter(
+            pk='rinnengan@sage.de').exclude(integer=9).exists())
+
     def test_range(self):
         # Test range on float.
         self.assertEquals(
@@ -3,6 +3,7 @@ import datetime
 from django.core.exceptions import ObjectDoesNotExist, MultipleObjectsReturned
 from django.test import TestCase
 
+from ..db.utils import approximate_count
 from .testmodels import FieldsWithOptionsModel, OrderedModel, \
     SelfReferenceModel
 
@@ -47,6 +48,32 @@ class NonReturnSetsTest(TestCase):
         self.assertEquals(
             FieldsWithOptionsModel.objects.filter(integer=2).count(), 2)
 
+    def test_count_excluded_pks(self):
+        self.assertEquals(FieldsWithOptionsModel.objects.exclude(
+            pk='itachi@uchia.com').count(), 4)
+        self.assertEquals(FieldsWithOptionsModel.objects.filter(
+            integer=2).exclude(pk='rinnengan@sage.de').count(), 2)
+        self.assertEquals(FieldsWithOptionsModel.objects.filter(
+            integer=2).exclude(pk='itachi@uchia.com').count(), 1)
+        self.assertEquals(FieldsWithOptionsModel.objects.exclude(
+            pk='itachi@uchia.com')[:2].count(), 2)
+
+    def test_count_included_pks(self):
+        self.assertEquals(FieldsWithOptionsModel.objects.filter(
+            pk__in=['itachi@uchia.com', 'rinnengan@sage.de',
+                    'itachi@uchia.com', 'nobody@example.com']).count(), 2)
+        self.assertEquals(FieldsWithOptionsModel.objects.filter(
+            pk__in=['itachi@uchia.com', 'rinnengan@sage.de'],
+            integer=2).count(), 1)
+
+    def test_count_approximate(self):
+        queryset = approximate_count(FieldsWithOptionsModel.objects.all())
+        self.assertEquals(queryset.filter(integer=2).count(), 2)
+
+        # Excluded primary keys are not subtracted.
+        self.assertEquals(queryset.filter(integer=2).exclude(
+            pk='itachi@uchia.com').count(), 2)
+
     def test_in_bulk(self):
         self.assertEquals(
             [key in ['sharingan@uchias.com', 'itachi@uchia.com']
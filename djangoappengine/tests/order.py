@@ -60,4 +60,30 @@ class OrderTest(TestCase):
                 OrderedModel.objects.filter(pk__in=pks).order_by()],
             priorities)
 
+    def test_slice_with_pk_filter(self):
+        pks, priorities = self.create_ordered_model_items()
+        self.assertEquals(
+            [item.priority for item in
+                OrderedModel.objects.filter(pk__in=pks)[:3]],
+            sorted(priorities, reverse=True)[:3])
+        self.assertEquals(
+            [item.priority for item in
+                OrderedModel.objects.filter(pk__in=pks)[1:3]],
+            sorted(priorities, reverse=True)[1:3])
+        self.assertEquals(
+            [item.priority for item in
+                OrderedModel.objects.filter(pk__in=pks)
+                .order_by('priority')[:10]],
+            sorted(priorities))
+
+    def test_multiple_orders_with_pk_filter(self):
+        pks, priorities = self.create_ordered_model_items()
+        OrderedModel(pk=5, priority=2).save()
+        pks.append(5)
+        self.assertEquals(
+            [(item.priority, item.pk) for item in
+                OrderedModel.objects.filter(pk__in=pks)
+                .order_by('priority', '-pk')[:4]],
+            [(1, 4), (2, 5), (2, 2), (5, 1)])
+
     # TODO: Test multiple orders.
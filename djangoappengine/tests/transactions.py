@@ -1,6 +1,7 @@
 from django.db.models import F
 from django.test import TestCase
 
+from ..db.utils import get_query_option, transactional_update
 from .testmodels import EmailModel
 
 
@@ -56,3 +57,18 @@ class TransactionTest(TestCase):
         self.assertEqual(1, len(EmailModel.objects.all().filter(number=294)))
 
        # TODO: Tests for: sub, muld, div, mod, ....
+
+    def test_transactional_update(self):
+        queryset = EmailModel.objects.all().filter(email=self.emails[0])
+        self.assertEqual(2, transactional_update(queryset).update(
+            number=F('number') + 10))
+
+        self.assertEqual([11, 12], sorted(EmailModel.objects.all().filter(
+            email=self.emails[0]).values_list('number', flat=True)))
+
+        # The flag survives cloning, the original queryset is unchanged.
+        queryset = transactional_update(EmailModel.objects.all())
+        self.assertTrue(get_query_option(queryset.filter(number=3).query,
+                                         'transactional_update'))
+        self.assertFalse(get_query_option(EmailModel.objects.all().query,
+                                          'transactional_update'))
@@ -26,6 +26,19 @@ EMULATED_OPS = {
 }
 
 
+class DescendingKey(object):
+    """
+    Wraps a value of an in-memory sort key, reversing its order.
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __cmp__(self, other):
+        return cmp(other.value, self.value)
+
+
 class NonrelQuery(object):
     """
     Base class for nonrel queries.
@@ -61,6 +74,7 @@ class NonrelQuery(object):
         self.query = compiler.query # sql.Query
         self.fields = fields
         self._negated = False
+        self._compiled_filters = {}
 
     def fetch(self, low_mark=0, high_mark=None):
         """
@@ -251,50 +265,89 @@ class NonrelQuery(object):
         """
         Checks if an entity returned by the database satisfies
         constraints in a WHERE tree (in-memory filtering).
+
+        The tree is compiled into a predicate the first time it's used,
+        so its leaves are decoded once per query, not once per entity.
+        """
+        compiled = self._compiled_filters.get(id(filters))
+        if compiled is None or compiled[0] is not filters:
+            compiled = (filters, self._compile_filters(filters))
+            self._compiled_filters[id(filters)] = compiled
+        return compiled[1](entity)
+
+    def _compile_filters(self, filters):
+        """
+        Returns a function checking if an entity satisfies constraints
+        in a WHERE tree.
         """
 
         # Filters without rules match everything.
         if not filters.children:
-            return True
-
-        result = filters.connector == AND
+            return lambda entity: True
+
+        tests = tuple(self._compile_filters(child)
+                      if isinstance(child, Node)
+                      else self._compile_leaf(child)
+                      for child in filters.children)
+        negated = filters.negated
+
+        if filters.connector == AND:
+            def predicate(entity):
+                for test in tests:
+                    if not test(entity):
+                        return negated
+                return not negated
+        else:
+            def predicate(entity):
+                for test in tests:
+                    if test(entity):
+                        return not negated
+                return negated
+        return predicate
+
+    def _compile_leaf(self, child):
+        """
+        Returns a function checking a constraint leaf, emulating a
+        database condition.
+        """
+        field, lookup_type, lookup_value = self._decode_child(child)
+        column = field.column
+        op = EMULATED_OPS[lookup_type]
+
+        if isinstance(lookup_value, (datetime.datetime, datetime.date,
+                                     datetime.time)):
+            none_matches = lookup_type in ('lt', 'lte')
+        elif lookup_type in ('startswith', 'contains', 'endswith', 'iexact',
+                             'istartswith', 'icontains', 'iendswith'):
+            none_matches = False
+        else:
+            none_matches = op(None, lookup_value)
 
-        for child in filters.children:
+        def test(entity):
+            entity_value = entity[column]
+            if entity_value is None:
+                return none_matches
+            return op(entity_value, lookup_value)
+        return test
 
-            # Recursively check a subtree,
-            if isinstance(child, Node):
-                submatch = self._matches_filters(entity, child)
+    def _make_sort_key(self, make_getter):
+        """
+        Returns a function computing the in-memory sort key of an
+        entity, to sort entities with a single key per entity rather
+        than with comparisons of pairs of them.
 
-            # Check constraint leaf, emulating a database condition.
-            else:
-                field, lookup_type, lookup_value = self._decode_child(child)
-                entity_value = entity[field.column]
-
-                if entity_value is None:
-                    if isinstance(lookup_value, (datetime.datetime, datetime.date,
-                                          datetime.time)):
-                        submatch = lookup_type in ('lt', 'lte')
-                    elif lookup_type in (
-                            'startswith', 'contains', 'endswith', 'iexact',
-                            'istartswith', 'icontains', 'iendswith'):
-                        submatch = False
-                    else:
-                        submatch = EMULATED_OPS[lookup_type](
-                            entity_value, lookup_value)
-                else:
-                    submatch = EMULATED_OPS[lookup_type](
-                        entity_value, lookup_value)
-
-            if filters.connector == OR and submatch:
-                result = True
-                break
-            elif filters.connector == AND and not submatch:
-                result = False
-                break
+        :param make_getter: Called with each ordering field, should
+                            return a function reading its value from
+                            an entity
+        """
+        getters = [(make_getter(field), ascending)
+                   for field, ascending in self.compiler._get_ordering()]
 
-        if filters.negated:
-            return not result
-        return result
+        def sort_key(entity):
+            return tuple(get(entity) if ascending
+                         else DescendingKey(get(entity))
+                         for get, ascending in getters)
+        return sort_key
 
     def _order_in_memory(self, lhs, rhs):
         for field, ascending in self.compiler._get_ordering():
@@ -416,7 +469,9 @@ class NonrelCompiler(SQLCompiler):
             high_mark = 1
         else:
             high_mark = self.query.high_mark
-        return self.build_query().count(high_mark)
+        # Counting never needs field values, only the primary key, so
+        # back-ends may use keys-only queries.
+        return self.build_query([self.query.get_meta().pk]).count(high_mark)
 
     def build_query(self, fields=None):
         """
@@ -522,10 +577,35 @@ class NonrelInsertCompiler(NonrelCompiler):
     """
 
     def execute_sql(self, return_id=False):
-        field_values = {}
+        key = self.insert(self._get_field_values(self.query),
+                          return_id=return_id)
+
+        # Pass the key value through normal database deconversion.
+        pk = self.query.get_meta().pk
+        return self.ops.convert_values(self.ops.value_from_db(key, pk), pk)
+
+    def execute_sql_bulk(self, queries, return_id=False):
+        """
+        Inserts the rows of many InsertQueries at once, returning their
+        keys in the same order.
+
+        :param queries: InsertQueries for the same model as self.query
+        """
+        rows = [self._get_field_values(query) for query in queries]
+        keys = self.insert_bulk(rows, return_id=return_id)
+
         pk = self.query.get_meta().pk
-        for (field, value), column in zip(self.query.values,
-                                          self.query.columns):
+        return [self.ops.convert_values(self.ops.value_from_db(key, pk), pk)
+                for key in keys]
+
+    def _get_field_values(self, query):
+        """
+        Returns a dict mapping fields of the query to their values
+        prepared for the database.
+        """
+        field_values = {}
+        pk = query.get_meta().pk
+        for (field, value), column in zip(query.values, query.columns):
 
             # Raise an exception for non-nullable fields without a value.
             if field is not None:
@@ -546,10 +626,7 @@ class NonrelInsertCompiler(NonrelCompiler):
 
             field_values[field] = value
 
-        key = self.insert(field_values, return_id=return_id)
-
-        # Pass the key value through normal database deconversion.
-        return self.ops.convert_values(self.ops.value_from_db(key, pk), pk)
+        return field_values
 
     def insert(self, values, return_id):
         """
@@ -567,6 +644,20 @@ class NonrelInsertCompiler(NonrelCompiler):
         """
         raise NotImplementedError
 
+    def insert_bulk(self, rows, return_id):
+        """
+        Creates many new entities, returning their keys in order.
+
+        Back-ends that can store many entities with a single call
+        should override this; by default it calls `insert` for each
+        row.
+
+        :param rows: A list of model objects as in `insert`
+        :param return_id: Whether to return the ids or keys of the newly
+                          created entities
+        """
+        return [self.insert(values, return_id) for values in rows]
+
 
 class NonrelUpdateCompiler(NonrelCompiler):
 
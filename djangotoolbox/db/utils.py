@@ -1,3 +1,4 @@
+from django.db import connections, router
 from django.db.backends.util import format_number
 
 
@@ -31,3 +32,112 @@ def decimal_to_string(value, max_digits=16, decimal_places=0):
     if n < max_digits - decimal_places:
         value = u'0' * (max_digits - decimal_places - n) + value
     return sign + value
+
+
+def bulk_create(objs, using=None):
+    """
+    Saves many new instances of the same model with a single
+    compiler call, letting the back-end batch the inserts, and sets
+    their primary keys (in order).
+
+    As with Django's bulk_create, the save() method is not called and
+    the pre_save / post_save signals are not sent.
+    """
+    # Imported here, as back-ends import this module while loading.
+    from django.db.models.fields import AutoField
+    from django.db.models.sql.subqueries import InsertQuery
+
+    objs = list(objs)
+    if not objs:
+        return objs
+
+    model = objs[0].__class__
+    opts = model._meta
+    using = using or router.db_for_write(model, instance=objs[0])
+    connection = connections[using]
+
+    queries = []
+    for obj in objs:
+        if obj.__class__ is not model:
+            raise ValueError("bulk_create can only save instances of a "
+                             "single model.")
+        fields = opts.local_fields
+        if obj.pk is None:
+            fields = [f for f in fields if not isinstance(f, AutoField)]
+        query = InsertQuery(model)
+        query.insert_values([(f, f.get_db_prep_save(f.pre_save(obj, True),
+                                                    connection=connection))
+                             for f in fields])
+        queries.append(query)
+
+    compiler = queries[0].get_compiler(using=using)
+    keys = compiler.execute_sql_bulk(queries,
+                                     return_id=opts.has_auto_field)
+
+    for obj, key in zip(objs, keys):
+        if obj.pk is None:
+            setattr(obj, opts.pk.attname, key)
+        obj._state.db = using
+        obj._state.adding = False
+        obj._entity_exists = True
+        obj._original_pk = obj.pk
+    return objs
+
+
+def prefetch_related(objs, *lookups):
+    """
+    Resolves the foreign keys named by lookups for all the instances
+    at once, with a single batch query per related model (and level,
+    as lookups may span relations, e.g. "owner__user"), caching the
+    related instances on them as select_related would.
+
+    Returns the instances as a list.
+    """
+    from django.db.models.sql.constants import LOOKUP_SEP
+
+    objs = list(objs)
+    for lookup in lookups:
+        instances = objs
+        for name in lookup.split(LOOKUP_SEP):
+            instances = _prefetch_foreign_key(instances, name)
+    return objs
+
+
+def _prefetch_foreign_key(objs, name):
+    """
+    Caches the instances referenced by the foreign key name on objs,
+    returning the referenced instances (with duplicates).
+    """
+    from django.db.models.fields.related import ForeignKey
+
+    related = []
+    pending = {}
+    for obj in objs:
+        field = obj._meta.get_field(name)
+        if not isinstance(field, ForeignKey) or \
+                not field.rel.get_related_field().primary_key:
+            raise ValueError("%s.%s is not a foreign key to a primary key." %
+                             (obj.__class__.__name__, name))
+        cache_name = field.get_cache_name()
+        if hasattr(obj, cache_name):
+            value = getattr(obj, cache_name)
+            if value is not None:
+                related.append(value)
+            continue
+        pk = getattr(obj, field.attname)
+        if pk is not None:
+            model = field.rel.to
+            pending.setdefault(model, {}).setdefault(pk, []).append(
+                (obj, cache_name))
+
+    for model, referers in pending.items():
+        instances = model._default_manager.in_bulk(referers.keys())
+        for pk, pairs in referers.items():
+            # Dangling references are left for the descriptor to
+            # report.
+            if pk not in instances:
+                continue
+            for obj, cache_name in pairs:
+                setattr(obj, cache_name, instances[pk])
+                related.append(instances[pk])
+    return related
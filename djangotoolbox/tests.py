@@ -12,6 +12,7 @@ from django.test import TestCase
 from django.utils.unittest import expectedFailure, skip
 
 from .fields import ListField, SetField, DictField, EmbeddedModelField
+from .db.utils import prefetch_related
 
 
 def count_calls(func):
@@ -33,6 +34,10 @@ class Source(models.Model):
     index = models.IntegerField()
 
 
+class Holder(models.Model):
+    source = models.ForeignKey(Source, null=True)
+
+
 class DecimalModel(models.Model):
     decimal = models.DecimalField(max_digits=9, decimal_places=2)
 
@@ -523,6 +528,81 @@ class SelectRelatedTest(TestCase):
         self.assertEqual(source.target.index, target.index)
 
 
+class PrefetchRelatedTest(TestCase):
+
+    def setUp(self):
+        targets = [Target.objects.create(index=i) for i in range(2)]
+        for i in range(4):
+            source = Source.objects.create(target=targets[i % 2], index=i)
+            Holder.objects.create(source=source)
+        Holder.objects.create(source=None)
+
+    def test_prefetch_related(self):
+        sources = prefetch_related(Source.objects.all(), 'target')
+        Target.objects.all().delete()
+        self.assertEqual(sorted((s.index, s.target.index) for s in sources),
+                         [(0, 0), (1, 1), (2, 0), (3, 1)])
+
+    def test_chain(self):
+        holders = prefetch_related(Holder.objects.all(), 'source__target')
+        Source.objects.all().delete()
+        Target.objects.all().delete()
+        self.assertEqual(
+            sorted(h.source and (h.source.index, h.source.target.index)
+                   for h in holders),
+            [None, (0, 0), (1, 1), (2, 0), (3, 1)])
+
+    def test_shared_instances(self):
+        sources = prefetch_related(Source.objects.all(), 'target')
+        targets = dict((s.target.index, s.target) for s in sources)
+        for source in sources:
+            self.assertTrue(source.target is targets[source.target.index])
+
+    def test_not_foreign_key(self):
+        self.assertRaises(ValueError, prefetch_related,
+                          Source.objects.all(), 'index')
+
+
+class MatchesFiltersTest(TestCase):
+
+    def setUp(self):
+        self.queryset = Source.objects.filter(index__gte=10).filter(
+            Q(index__lt=500) | Q(target=3)).exclude(index=20)
+        self.entities = [{'index': i, 'target_id': i % 5}
+                         for i in range(1000)]
+        self.expected = [e for e in self.entities
+                         if e['index'] >= 10 and e['index'] != 20 and
+                            (e['index'] < 500 or e['target_id'] == 3)]
+
+    def build_query(self):
+        compiler = self.queryset.query.get_compiler(using='default')
+        return compiler.build_query()
+
+    def test_matches_filters(self):
+        query = self.build_query()
+        where = self.queryset.query.where
+        self.assertEqual(
+            [e for e in self.entities if query._matches_filters(e, where)],
+            self.expected)
+
+    def test_compiled_once(self):
+        query = self.build_query()
+        where = self.queryset.query.where
+        query._decode_child = count_calls(query._decode_child)
+        for entity in self.entities[:100]:
+            query._matches_filters(entity, where)
+        self.assertEqual(query._decode_child.calls, 4)
+
+    def test_same_as_decoding(self):
+        # The predicate compiled once and cached, against the tree
+        # decoded again for each entity.
+        query = self.build_query()
+        where = self.queryset.query.where
+        self.assertEqual(
+            [query._matches_filters(e, where) for e in self.entities],
+            [query._compile_filters(where)(e) for e in self.entities])
+
+
 class DBColumn(models.Model):
     a = models.IntegerField(db_column='b')
 
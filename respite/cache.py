@@ -0,0 +1,58 @@
+import time
+
+from django.core.cache import cache
+
+# Seconds that versions are cached for (the longest relative timeout of memcached).
+VERSIONS_TIMEOUT = 30 * 24 * 60 * 60
+
+# Seconds that fragments are cached for. Fragments are keyed by the versions of their
+# resources, so they never need to be invalidated; they only expire to free the cache.
+FRAGMENTS_TIMEOUT = 24 * 60 * 60
+
+def _version_key(resource, id):
+    return 'respite:version:%s:%s' % (resource, id)
+
+def get_version(resource, id):
+    """
+    Return the version of a resource.
+
+    :param resource: A string describing the kind of resource (e.g. 'project').
+    :param id: The id of the resource.
+
+    Versions live in the cache. An evicted version restarts from the current time in milliseconds,
+    so that it never goes back to a version that has already been handed out.
+    """
+    key = _version_key(resource, id)
+    version = cache.get(key)
+
+    if version is None:
+        version = int(time.time() * 1000)
+
+        if not cache.add(key, version, VERSIONS_TIMEOUT):
+            version = cache.get(key) or version
+
+    return version
+
+def bump_version(resource, id):
+    """
+    Change the version of a resource, e.g. when it is saved.
+
+    :param resource: A string describing the kind of resource (e.g. 'project').
+    :param id: The id of the resource.
+    """
+    try:
+        cache.incr(_version_key(resource, id))
+    except ValueError:
+        # The version isn't cached; the next read starts a new one.
+        pass
+
+def fragments_key(resource, id, version, *vary_on):
+    """
+    Return the cache key of the fragments rendered for a version of a resource.
+
+    :param resource: A string describing the kind of resource (e.g. 'project').
+    :param id: The id of the resource.
+    :param version: The version of the resource (see ``get_version``).
+    :param vary_on: Anything else the fragments depend on.
+    """
+    return 'respite:fragments:%s:%s:%s' % (resource, id, ':'.join([str(value) for value in (version,) + vary_on]))
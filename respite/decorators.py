@@ -1,6 +1,9 @@
 import inspect
+from calendar import timegm
+from copy import copy
 from functools import wraps
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseRedirect, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe, parse_etags, quote_etag
 from respite.urls import routes
 
 def override_supported_formats(formats):
@@ -9,10 +12,14 @@ def override_supported_formats(formats):
 
     Arguments:
     formats -- A list of strings describing formats, e.g. ``['html', 'json']``.
+
+    Views instances are shared between requests, so the decorated function is called
+    on a copy of the instance.
     """
     def decorator(function):
         @wraps(function)
         def wrapper(self, *args, **kwargs):
+            self = copy(self)
             self.supported_formats = formats
             return function(self, *args, **kwargs)
         return wrapper
@@ -98,6 +105,111 @@ def before(method_name):
     return decorator
 
 
+def condition(etag=None, last_modified=None):
+    """
+    Answer conditional GET and HEAD requests with HTTP 304 Not Modified without invoking the
+    decorated view if the resource didn't change, and set the 'ETag' and 'Last-Modified' headers
+    of its successful responses.
+
+    The given methods are called with the arguments of the decorated view and should be much
+    cheaper than it (e.g. read a version counter rather than the resource and its relations).
+    They may return ``None`` to skip the check for a request. The format of the response is
+    appended to the ETag, as the representations of a resource in different formats differ.
+
+    ``If-None-Match`` takes precedence over ``If-Modified-Since``, as in RFC 2616. Resources
+    that depend on the current user (e.g. through their privileges) should include the user in
+    their ETag and not give a modification date, which can't tell users apart.
+
+    Views may leave a response out of the check by marking it ``Cache-Control: no-store`` (e.g.
+    with ``django.utils.cache.patch_cache_control``) when it isn't final yet, e.g. because it
+    shows data that is still being loaded; such responses are given neither header.
+
+    Example usage::
+
+        class ArticleViews(Views):
+
+            @condition(etag='_version')
+            def show(self, request, id):
+                ...
+
+            def _version(self, request, id):
+                return '%s-%s' % (id, cache.get('article:version:%s' % id))
+
+    :param etag: A string describing a method returning a string describing the version of the resource.
+    :param last_modified: A string describing a method returning a ``datetime.datetime`` instance
+        describing the time (in UTC) the resource was last modified at.
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method not in ['GET', 'HEAD']:
+                return function(self, request, *args, **kwargs)
+
+            # Let the view respond to requests for formats it doesn't support.
+            format = self._get_format(request)
+            if not format:
+                return function(self, request, *args, **kwargs)
+
+            etag_value = None
+            if etag:
+                version = getattr(self, etag)(request, *args, **kwargs)
+                if version is not None:
+                    etag_value = '%s-%s' % (version, format.extension)
+
+            last_modified_value = None
+            if last_modified:
+                date = getattr(self, last_modified)(request, *args, **kwargs)
+                if date is not None:
+                    last_modified_value = timegm(date.utctimetuple())
+
+            if etag_value is None and last_modified_value is None:
+                return function(self, request, *args, **kwargs)
+
+            if _not_modified(request, etag_value, last_modified_value):
+                response = HttpResponseNotModified()
+            else:
+                response = function(self, request, *args, **kwargs)
+
+                if response.status_code != 200:
+                    return response
+
+                if 'no-store' in response.get('Cache-Control', ''):
+                    return response
+
+            if etag_value is not None and not response.has_header('ETag'):
+                response['ETag'] = quote_etag(etag_value)
+            if last_modified_value is not None and not response.has_header('Last-Modified'):
+                response['Last-Modified'] = http_date(last_modified_value)
+
+            return response
+        return wrapper
+    return decorator
+
+def _not_modified(request, etag, last_modified):
+    """
+    Return ``True`` if the client's copy of the resource is up to date.
+
+    :param request: A django.http.HttpRequest instance.
+    :param etag: A string describing the ETag of the resource, or ``None``.
+    :param last_modified: An integer describing the time the resource was last modified at, in seconds since the epoch, or ``None``.
+    """
+    if 'HTTP_IF_NONE_MATCH' in request.META:
+        if etag is None:
+            return False
+
+        etags = parse_etags(request.META['HTTP_IF_NONE_MATCH'])
+        return etag in etags or '*' in etags
+
+    if 'HTTP_IF_MODIFIED_SINCE' in request.META:
+        if last_modified is None:
+            return False
+
+        if_modified_since = parse_http_date_safe(request.META['HTTP_IF_MODIFIED_SINCE'].split(';')[0])
+        return if_modified_since is not None and last_modified <= if_modified_since
+
+    return False
+
+
 def rest_login_required(method_name):
     """
         Implements a decorator similar to the default @login_required
@@ -9,214 +9,197 @@ import django.forms
 import datetime
 from decimal import Decimal
 
+# Field names to serialize models without a 'serialize' method by, per model.
+FIELD_NAMES = {}
+
 class Serializer(object):
     """Base class for serializers."""
 
+    # Types and the names of the methods serializing them, in order of precedence.
+    # The handler of each class is looked up once and cached in a dispatch table.
+    handlers = (
+        (dict, 'serialize_dictionary'),
+        ((list, set), 'serialize_list'),
+        (django.db.models.query.DateQuerySet, 'serialize_datequeryset'),
+        (django.db.models.query.ValuesListQuerySet, 'serialize_valueslistqueryset'),
+        (django.db.models.query.QuerySet, 'serialize_queryset'),
+        (django.db.models.Model, 'serialize_model'),
+        ((django.forms.Form, django.forms.ModelForm), 'serialize_form'),
+        ((str, unicode), 'serialize_simple'),
+        ((int, float, long), 'serialize_simple'),
+        ((datetime.date, datetime.datetime), 'serialize_date'),
+        (django.db.models.manager.Manager, 'serialize_manager'),
+        (Decimal, 'serialize_decimal_field'),
+        (django.core.files.base.File, 'serialize_field_file'),
+        (type(None), 'serialize_simple'),
+    )
+
     def __init__(self, source):
         self.source = source
+        self.dispatch_table = self.get_dispatch_table()
+
+    @classmethod
+    def get_dispatch_table(cls):
+        """Return the dispatch table of this class, mapping classes to their handlers."""
+        if '_dispatch_table' not in cls.__dict__:
+            cls._dispatch_table = {}
+
+        return cls._dispatch_table
 
     def serialize(self, request):
         """
         Serialize the given object into into simple
         data types (e.g. lists, dictionaries, strings).
         """
+        return self.serialize_value(self.source)
+
+    def serialize_value(self, anything):
+        """Serialize anything by the handler of its class."""
+        try:
+            handler = self.dispatch_table[anything.__class__]
+        except KeyError:
+            handler = self.find_handler(anything.__class__)
+
+        if handler is not None:
+            return handler(self, anything)
+
+        if hasattr(anything, 'serialize'):
+            return self.serialize_value(anything.serialize())
+
+        raise TypeError("Respite doesn't know how to serialize %s" % anything.__class__.__name__)
+
+    def find_handler(self, cls):
+        """Find the handler of the given class, and store it in the dispatch table."""
+        handler = None
+        for types, name in self.handlers:
+            if issubclass(cls, types):
+                handler = getattr(self.__class__, name)
+                break
+
+        self.dispatch_table[cls] = handler
+        return handler
+
+    def serialize_dictionary(self, dictionary):
+        """Dictionaries are serialized recursively, as ordered dictionaries keeping the order of their keys."""
+        serialize = self.serialize_value
+        return OrderedDict([(key, serialize(value)) for key, value in dictionary.items()])
+
+    def serialize_list(self, list):
+        """Lists are serialized recursively."""
+        serialize = self.serialize_value
+        return [serialize(item) for item in list]
+
+    def serialize_queryset(self, queryset):
+        """Querysets are serialized as lists of models."""
+        serialize_model = self.serialize_model
+        return [serialize_model(model) for model in queryset]
+
+    def serialize_datequeryset(self, datequeryset):
+        """DateQuerysets are serialized as lists of dates."""
+        return [date.isoformat() for date in datequeryset]
+
+    def serialize_valueslistqueryset(self, valueslistqueryset):
+        """ValuesListQuerysets are serialized as lists of values."""
+        data = []
+
+        # Serialize valueslistqueryset as a list of values
+        for value in valueslistqueryset:
+            if isinstance(value, tuple):
+                data.append(self.serialize_list(value))
+            else:
+                data.append(self.serialize_value(value))
+
+        return data
+
+    def serialize_manager(self, manager):
+        """Managers are serialized as list of models."""
+        return self.serialize_queryset(manager.all())
+
+    def serialize_model(self, model):
+        """
+        Models are serialized by calling their 'serialize' method.
 
-        def serialize(anything):
-            
-            def serialize_dictionary(dictionary):
-                """Dictionaries are serialized recursively."""
-                data = OrderedDict()
-
-                # Serialize each of the dictionary's keys
-                for key, value in dictionary.items():
-                    data.update({ key: serialize(value) })
-
-                return data
-                
-            def serialize_list(list):
-                """Lists are serialized recursively."""
-                data = []
-                
-                # Serialize each of the list's items
-                for item in list:
-                    data.append(serialize(item))
-                    
-                return data
-
-            def serialize_queryset(queryset):
-                """Querysets are serialized as lists of models."""
-                data = []
-
-                # Serialize queryset as a list of models
-                for model in queryset:
-                    data.append(serialize_model(model))
-
-                return data
-
-            def serialize_datequeryset(datequeryset):
-                """DateQuerysets are serialized as lists of dates."""
-                data = []
-
-                # Serialize datequeryset as a list of datetime objects
-                for date in datequeryset:
-                    data.append(serialize_date(date))
-
-                return data
-
-            def serialize_valueslistqueryset(valueslistqueryset):
-                """DateQuerysets are serialized as lists of values."""
-                data = []
-
-                # Serialize valueslistqueryset as a list of values
-                for value in valueslistqueryset:
-                    if isinstance(value, tuple):
-                        data.append(serialize_list(value))
-                    else:
-                        data.append(serialize(value))
-
-                return data
-
-            def serialize_manager(manager):
-                """Managers are serialized as list of models."""
-                data = []
-
-                for model in manager.all():
-                    data.append(serialize_model(model))
-
-                return data
+        Models that don't define a 'serialize' method are
+        serialized as a dictionary of fields.
 
-            def serialize_model(model):
-                """
-                Models are serialized by calling their 'serialize' method.
+        Example:
 
-                Models that don't define a 'serialize' method are
-                serialized as a dictionary of fields.
+            {
+                'id': 1,
+                'title': 'Mmmm pie',
+                'content: 'Pie is good!'
+            }
 
-                Example:
+        """
+        if hasattr(model, 'serialize'):
+            return self.serialize_value(model.serialize())
 
-                    {
-                        'id': 1,
-                        'title': 'Mmmm pie',
-                        'content: 'Pie is good!'
-                    }
+        try:
+            field_names = FIELD_NAMES[model.__class__]
+        except KeyError:
+            field_names = FIELD_NAMES[model.__class__] = [
+                field.name for field in model._meta.fields + model._meta.many_to_many
+            ]
 
-                """
+        serialize = self.serialize_value
+        data = OrderedDict()
+        for name in field_names:
+            data[name] = serialize(getattr(model, name))
 
-                if hasattr(model, 'serialize'):
-                    return serialize(model.serialize())
-                else:
-                    data = OrderedDict()
-                    for field in model._meta.fields + model._meta.many_to_many:
-                        data.update({
-                            field.name: serialize(getattr(model, field.name ))
-                        })
+        return data
 
-                    return data
+    def serialize_form(self, form):
+        """
+        Forms are serialized as a dictionary of fields and errors (if any).
 
-            def serialize_form(form):
-                """
-                Forms are serialized as a dictionary of fields and errors (if any).
+        Example:
 
-                Example:
+            {
+                'fields': ['title', 'content'],
+                'errors': {
+                    'content': 'Must describe pie.'
+                }
+            }
 
+        """
+        data = OrderedDict()
+
+        # Serialize form fields as a list of strings
+        data['fields'] = []
+        for field in form.fields:
+            data['fields'].append(field)
+
+        # Serialize form errors as a dictionary with keys 'field' and 'error'
+        if form.errors:
+            data['errors'] = []
+            for field in form:
+                data['errors'].append(
                     {
-                        'fields': ['title', 'content'],
-                        'errors': {
-                            'content': 'Must describe pie.'
-                        }
+                        'field': field.name,
+                        'error': field.errors.as_text()
                     }
-
-                """
-                data = OrderedDict()
-
-                # Serialize form fields as a list of strings
-                data['fields'] = []
-                for field in form.fields:
-                    data['fields'].append(field)
-
-                # Serialize form errors as a dictionary with keys 'field' and 'error'
-                if form.errors:
-                    data['errors'] = []
-                    for field in form:
-                        data['errors'].append(
-                            {
-                                'field': field.name,
-                                'error': field.errors.as_text()
-                            }
-                        )
-
-                return data
-
-            def serialize_date(datetime):
-                """Dates are serialized as ISO 8601-compatible strings."""
-                return datetime.isoformat()
-
-            def serialize_field_file(field_file):
-                """Filefields are serialized as strings describing their URL."""
-                try:
-                    return field_file.url
-                except ValueError:
-                    return None
-
-            def serialize_image_field_file(image_field_file):
-                """Imagefields are serialized as strings describing their URL."""
-                try:
-                    return image_field_file.url
-                except ValueError:
-                    return None
-
-            def serialize_decimal_field(decimal_field):
-                """Decimal fields are serialized as strings."""
-                try:
-                    return str(decimal_field)
-                except ValueError:
-                    return None
-
-            if isinstance(anything, dict):
-                return serialize_dictionary(anything)
-
-            if isinstance(anything, (list, set)):
-                return serialize_list(anything)
-
-            if isinstance(anything, django.db.models.query.DateQuerySet):
-                return serialize_datequeryset(anything)
-
-            if isinstance(anything, django.db.models.query.ValuesListQuerySet):
-                return serialize_valueslistqueryset(anything)
-
-            if isinstance(anything, django.db.models.query.QuerySet):
-                return serialize_queryset(anything)
-
-            if isinstance(anything, django.db.models.Model):
-                return serialize_model(anything)
-
-            if isinstance(anything, (django.forms.Form, django.forms.ModelForm)):
-                return serialize_form(anything)
-
-            if isinstance(anything, (str, unicode)):
-                return anything
-
-            if isinstance(anything, (int, float, long)):
-                return anything
-
-            if isinstance(anything, (datetime.date, datetime.datetime)):
-                return serialize_date(anything)
-
-            if isinstance(anything, django.db.models.manager.Manager):
-                return serialize_manager(anything)
-
-            if isinstance(anything, Decimal):
-                return serialize_decimal_field(anything)
-
-            if isinstance(anything, django.core.files.base.File):
-                return serialize_field_file(anything)
-
-            if anything is None:
-                return None
-
-            if hasattr(anything, 'serialize'):
-                return serialize(anything.serialize())
-
-            raise TypeError("Respite doesn't know how to serialize %s" % anything.__class__.__name__)
-
-        return serialize(self.source)
+                )
+
+        return data
+
+    def serialize_simple(self, value):
+        """Strings, numbers and None are serialized as they are."""
+        return value
+
+    def serialize_date(self, datetime):
+        """Dates are serialized as ISO 8601-compatible strings."""
+        return datetime.isoformat()
+
+    def serialize_field_file(self, field_file):
+        """Filefields and imagefields are serialized as strings describing their URL."""
+        try:
+            return field_file.url
+        except ValueError:
+            return None
+
+    def serialize_decimal_field(self, decimal_field):
+        """Decimal fields are serialized as strings."""
+        try:
+            return str(decimal_field)
+        except ValueError:
+            return None
@@ -10,9 +10,18 @@ class JSONPSerializer(JSONSerializer):
     def serialize(self, request):
         data = super(JSONPSerializer, self).serialize(request)
 
+        return '%s(%s)' % (self.get_callback(request), data)
+
+    def stream(self, request):
+        yield '%s(' % self.get_callback(request)
+
+        for chunk in super(JSONPSerializer, self).stream(request):
+            yield chunk
+
+        yield ')'
+
+    def get_callback(self, request):
         if 'callback' in request.GET:
-            callback = request.GET['callback']
+            return request.GET['callback']
         else:
-            callback = 'callback'
-
-        return '%s(%s)' % (callback, data)
+            return 'callback'
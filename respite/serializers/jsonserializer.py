@@ -2,12 +2,79 @@ try:
     import json
 except ImportError:
     from django.utils import simplejson as json
-    
+
+import django.db.models
+
 from respite.serializers.base import Serializer
-    
+
+# The minimum length of the chunks yielded when streaming.
+CHUNK_SIZE = 8192
+
 class JSONSerializer(Serializer):
 
     def serialize(self, request):
         data = super(JSONSerializer, self).serialize(request)
 
         return json.dumps(data, ensure_ascii=False)
+
+    def stream(self, request):
+        """
+        Serialize the given object into JSON, yielding it in chunks of at least
+        CHUNK_SIZE characters (e.g. for streaming responses).
+
+        Lists, querysets and managers are encoded one item at a time, so large
+        lists are never serialized as a whole.
+        """
+        buffer = []
+        length = 0
+
+        for chunk in self.iter_json(self.source):
+            buffer.append(chunk)
+            length += len(chunk)
+
+            if length >= CHUNK_SIZE:
+                yield ''.join(buffer)
+                buffer = []
+                length = 0
+
+        if buffer:
+            yield ''.join(buffer)
+
+    def iter_json(self, anything):
+        """Yield the JSON encoding of anything in pieces."""
+        if isinstance(anything, dict):
+            yield '{'
+            separator = ''
+            for key, value in anything.items():
+                if not isinstance(key, basestring):
+                    key = unicode(key)
+                yield '%s%s: ' % (separator, self.dumps(key))
+                for chunk in self.iter_json(value):
+                    yield chunk
+                separator = ', '
+            yield '}'
+
+        elif isinstance(anything, (django.db.models.query.DateQuerySet, django.db.models.query.ValuesListQuerySet)):
+            yield self.dumps(self.serialize_value(anything))
+
+        elif isinstance(anything, (list, set, django.db.models.query.QuerySet, django.db.models.manager.Manager)):
+            if isinstance(anything, django.db.models.manager.Manager):
+                anything = anything.all()
+
+            if isinstance(anything, django.db.models.query.QuerySet):
+                serialize = self.serialize_model
+            else:
+                serialize = self.serialize_value
+
+            yield '['
+            separator = ''
+            for item in anything:
+                yield separator + self.dumps(serialize(item))
+                separator = ', '
+            yield ']'
+
+        else:
+            yield self.dumps(self.serialize_value(anything))
+
+    def dumps(self, data):
+        return json.dumps(data, ensure_ascii=False)
@@ -1,10 +1,22 @@
+import re
 from copy import deepcopy
 
+try:
+    from collections import OrderedDict
+except ImportError:
+    from ..lib.ordereddict import OrderedDict
+
 from django.conf.urls.defaults import *
+from django.core.urlresolvers import RegexURLResolver, ResolverMatch, Resolver404
 from django.http import HttpResponse
 
 from respite.inflector import pluralize, cc2us
 
+# Python can't compile regular expressions with more than 100 groups, so the routes
+# of large resources are combined into several regular expressions of at most this
+# many groups.
+MAX_GROUPS = 90
+
 def resource(views, routes, prefix=''):
     """
     Route a collection of views.
@@ -12,73 +24,55 @@ def resource(views, routes, prefix=''):
     :param views: A reference to the class that defines the views.
     :param routes: A list of routes.
     :param prefix: A string to prefix the routes by, or ``''`` by default.
+
+    Returns a list of a single ``ResourceResolver`` matching the routes in a single pass
+    and dispatching requests to a single, shared instance of the views class.
     """
     routes = deepcopy(routes)
 
-    def dispatch(request, GET=False, POST=False, PUT=False, DELETE=False, PATCH=False, **kwargs):
-        """
-        Dispatch the request according to the request method and the string contained in
-        the corresponding keyword argument.
+    # Views are stateless, so a single instance serves all requests.
+    instance = views()
 
-        For example, if the request method is HTTP GET and the 'GET' argument to this function is
-        set to 'index', the 'index' function of the views class will be invoked and returned.
+    def dispatcher(methods):
+        """
+        Return a view dispatching requests according to their method.
 
-        Arguments:
-        :param request: A django.http.HttpRequest object.
-        :param GET: A string describing the function to delegate the request to on HTTP GET.
-        :param POST: A string describing the function to delegate the request to on HTTP POST.
-        :param PUT: A string describing the function to delegate the request to on HTTP PUT.
-        :param DELETE: A string describing the function to delegate the request to on HTTP DELETE.
-        :param PATCH: A string describing the function to delegate the request to on HTTP PATCH.
+        :param methods: A dictionary of HTTP methods and the names of the
+            corresponding views (e.g. ``{'GET': 'index', 'POST': 'create'}``).
         """
+        functions = {}
+        for method in ['GET', 'POST', 'PUT', 'DELETE', 'PATCH']:
+            if method in methods:
+                functions[method] = getattr(instance, methods[method])
+
+        if 'GET' in functions:
+            functions['HEAD'] = functions['GET']
+
+        allowed_methods = ', '.join([method for method in ['GET', 'POST', 'PUT', 'DELETE'] if method in methods])
+
+        options = dict([(method, function) for method, function in functions.items() if method in ['GET', 'POST', 'PUT', 'DELETE']])
+
+        def dispatch(request, *args, **kwargs):
+            """
+            Dispatch the request to the view of its method, list communication options on HTTP
+            OPTIONS or return HTTP 405 Method Not Allowed if the request method isn't routed.
+
+            :param request: A django.http.HttpRequest object.
+            """
+            try:
+                function = functions[request.method]
+            except KeyError:
+                if request.method == 'OPTIONS':
+                    return instance.options(request, options, *args, **kwargs)
 
-        # Return HTTP 405 Method Not Allowed if the request method isn't routed
-        if request.method == 'GET' and not GET \
-        or request.method == 'POST' and not POST \
-        or request.method == 'PUT' and not PUT \
-        or request.method == 'DELETE' and not DELETE \
-        or request.method == 'PATCH' and not PATCH \
-        or request.method not in ['GET', 'POST', 'PUT', 'DELETE', 'PATCH', 'OPTIONS', 'HEAD']:
-            allowed_methods = []
-
-            if GET:
-                allowed_methods.append('GET')
-            if POST:
-                allowed_methods.append('POST')
-            if PUT:
-                allowed_methods.append('PUT')
-            if DELETE:
-                allowed_methods.append('DELETE')
-
-            response = HttpResponse()
-            response.status_code = 405
-            response['Allow'] = ', '.join(allowed_methods)
-            return response
-
-        # Dispatch the request
-        if request.method in ['GET', 'HEAD']:
-            return getattr(views(), GET)(request, **kwargs)
-        if request.method == 'POST':
-            return getattr(views(), POST)(request, **kwargs)
-        if request.method == 'PUT':
-            return getattr(views(), PUT)(request, **kwargs)
-        if request.method == 'DELETE':
-            return getattr(views(), DELETE)(request, **kwargs)
-        if request.method == 'PATCH':
-            return getattr(views(), PATCH)(request, **kwargs)
-        if request.method == 'OPTIONS':
-            map = {}
-
-            if GET:
-                map['GET'] = getattr(views(), GET)
-            if POST:
-                map['POST'] = getattr(views(), POST)
-            if PUT:
-                map['PUT'] = getattr(views(), PUT)
-            if DELETE:
-                map['DELETE'] = getattr(views(), DELETE)
-
-            return views().options(request, map, **kwargs)
+                response = HttpResponse()
+                response.status_code = 405
+                response['Allow'] = allowed_methods
+                return response
+
+            return function(request, *args, **kwargs)
+
+        return dispatch
 
     def urlify(routes):
         """
@@ -87,46 +81,127 @@ def resource(views, routes, prefix=''):
         Arguments:
         :param routes: A list of routes.
         """
-        urls = []
 
-        # Route regular expressions and names may be lambdas; expand them.
-        for i, route in enumerate(routes):
+        # Collect routes and their siblings (i.e. routes that share the same regular
+        # expression) in a dictionary of regular expressions and dictionaries of keys that
+        # describe HTTP methods and values that describe the corresponding view function,
+        # along with the names of the routes.
+        #
+        # Example:
+        #
+        # {
+        #   '^articles/(?:$|index(?:\.[a-zA-Z]+)?$)': ({'GET': 'index', 'POST': 'create'}, ['articles.index', 'articles.create'])
+        # }
+        siblings = OrderedDict()
+
+        for route in routes:
+
+            # Route regular expressions and names may be lambdas; expand them.
             if callable(route.regex):
-                routes[i].regex = route.regex(prefix)
+                regex = route.regex(prefix)
             else:
-                routes[i].regex = '^%s' % prefix + (route.regex[1:] if route.regex[0] == '^' else route.regex)
+                regex = '^%s' % prefix + (route.regex[1:] if route.regex[0] == '^' else route.regex)
 
             if callable(route.name):
-                routes[i].name = route.name(views)
-
-        for route in list(routes):
-
-            # Collect this route and its siblings (i.e. routes that share
-            # same regular expression) in a dictionary of keys that describe
-            # HTTP methods and values that describe the corresponding
-            # view function.
-            #
-            # Example:
-            #
-            # {
-            #   'GET': 'index',
-            #   'POST': 'create'
-            # }
-            kwargs = {}
-            for sibling in list(routes):
-                if sibling.regex == route.regex:
-                    kwargs[sibling.method] = sibling.view
-                    routes.remove(sibling)
-
-            urls.append(
-                url(
-                    regex = route.regex,
-                    view = dispatch,
-                    kwargs = kwargs,
-                    name = route.name
-                )
-            )
-
-        return urls
+                name = route.name(views)
+            else:
+                name = route.name
+
+            if regex not in siblings:
+                siblings[regex] = ({}, [])
+
+            siblings[regex][0][route.method] = route.view
+
+            if name not in siblings[regex][1]:
+                siblings[regex][1].append(name)
+
+        # Siblings are dispatched by the urlpattern named after the first of them; the
+        # other names are registered as aliases, so that they may be reversed too.
+        urls, aliases = [], []
+        for regex, (methods, names) in siblings.items():
+            dispatch = dispatcher(methods)
+
+            urls.append(url(regex = regex, view = dispatch, name = names[0]))
+
+            for name in names[1:]:
+                aliases.append(url(regex = regex, view = dispatch, name = name))
+
+        return [ResourceResolver(urls, aliases)]
 
     return urlify(routes)
+
+class ResourceResolver(RegexURLResolver):
+    """
+    Resolve the urlpatterns of a resource by matching the request path against their
+    regular expressions combined into one, rather than against each of them in turn.
+
+    URLs are reversed by the given urlpatterns and aliases, like an ``include`` with no prefix.
+
+    :param urlpatterns: A list of django.core.urlresolvers.RegexURLPattern instances to resolve.
+    :param aliases: A list of django.core.urlresolvers.RegexURLPattern instances that are only
+        reversed (e.g. other names of the given urlpatterns).
+    """
+
+    def __init__(self, urlpatterns, aliases=()):
+        super(ResourceResolver, self).__init__(r'', list(urlpatterns) + list(aliases))
+        self.combined = self._combine(urlpatterns)
+
+    def _combine(self, urlpatterns):
+        """
+        Return a list of regular expressions combining the given urlpatterns in order, each paired
+        with a dictionary of the indexes of their top-level groups and tuples of the urlpattern,
+        the indexes of its first and last groups and its named groups.
+
+        :param urlpatterns: A list of django.core.urlresolvers.RegexURLPattern instances.
+        """
+        combined = []
+        alternatives, lookups, groups = [], {}, 0
+
+        for i, pattern in enumerate(urlpatterns):
+
+            # Python can only match a regular expression from the start of the path;
+            # let unanchored ones match anywhere, like RegexURLResolver does.
+            regex = pattern.regex.pattern
+            if not regex.startswith('^'):
+                regex = '.*?' + regex
+
+            # Rename the named groups of every regular expression, as they must be
+            # unique across the combined one.
+            regex = re.sub(r'\(\?P([<=])(\w+)', r'(?P\1_%d_\2' % i, regex)
+            names = [(name, '_%d_%s' % (i, name)) for name in pattern.regex.groupindex]
+
+            if alternatives and groups + 1 + pattern.regex.groups > MAX_GROUPS:
+                combined.append((re.compile('|'.join(alternatives), re.UNICODE), lookups))
+                alternatives, lookups, groups = [], {}, 0
+
+            alternatives.append('(%s)' % regex)
+            lookups[groups + 1] = (pattern, groups + 1, groups + 1 + pattern.regex.groups, names)
+            groups += 1 + pattern.regex.groups
+
+        if alternatives:
+            combined.append((re.compile('|'.join(alternatives), re.UNICODE), lookups))
+
+        return combined
+
+    def resolve(self, path):
+        for regex, lookups in self.combined:
+            match = regex.match(path)
+
+            if match:
+                # The enclosing group of a urlpattern is the last group to match.
+                pattern, first, last, names = lookups[match.lastindex]
+
+                # If there are any named groups, use those as kwargs, ignoring
+                # non-named groups. Otherwise, pass all non-named arguments as
+                # positional arguments (see RegexURLPattern.resolve).
+                kwargs = dict([(name, match.group(group)) for name, group in names])
+                if kwargs:
+                    args = ()
+                else:
+                    args = match.groups()[first:last]
+
+                kwargs.update(pattern.default_args)
+
+                return ResolverMatch(pattern.callback, args, kwargs, pattern.name)
+
+        raise Resolver404({'tried': [[pattern] for pattern in self.url_patterns], 'path': path})
@@ -1,3 +1,11 @@
+import threading
+from functools import wraps
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    from .lib.ordereddict import OrderedDict
+
 from django import forms
 
 def generate_form(model, form=None, fields=False, exclude=False):
@@ -23,6 +31,38 @@ def generate_form(model, form=None, fields=False, exclude=False):
 
     return Form
 
+def lru_cache(maxsize=100):
+    """
+    Cache the return values of the decorated function by its argument, discarding
+    the least recently used ones once more than ``maxsize`` are cached.
+
+    :param maxsize: An integer describing the maximum number of cached return values.
+
+    The decorated function must take a single hashable argument, and its return values
+    are shared between callers so they should be immutable.
+    """
+    def decorator(function):
+        cache = OrderedDict()
+        lock = threading.Lock()
+
+        @wraps(function)
+        def wrapper(argument):
+            with lock:
+                try:
+                    # Reinsert hits so the least recently used value comes first.
+                    value = cache.pop(argument)
+                except KeyError:
+                    value = function(argument)
+
+                    if len(cache) >= maxsize:
+                        cache.popitem(last=False)
+
+                cache[argument] = value
+
+            return value
+        return wrapper
+    return decorator
+
 def parse_content_type(content_type):
     """
     Return a tuple of content type and charset.
@@ -34,35 +74,41 @@ def parse_content_type(content_type):
     else:
         return (content_type, 'ISO-8859-1')
 
+@lru_cache(maxsize=64)
 def parse_http_accept_header(header):
     """
-    Return a list of content types listed in the HTTP Accept header
+    Return a tuple of content types listed in the HTTP Accept header
     ordered by quality.
 
+    Content types of equal quality keep the order they are listed in, and content types
+    of quality 0 (i.e. not acceptable) are left out. Browsers send only a handful of distinct
+    headers, so parsed headers are cached.
+
     :param header: A string describing the contents of the HTTP Accept header.
     """
-    components = [item.strip() for item in header.split(',')]
-
     l = []
-    for component in components:
-        if ';' in component:
-            subcomponents = [item.strip() for item in component.split(';')]
-            l.append(
-                (
-                    subcomponents[0], # eg. 'text/html'
-                    subcomponents[1][2:] # eg. 'q=0.9'
-                )
-            )
-        else:
-            l.append((component, '1'))
+    for component in header.split(','):
+        subcomponents = [item.strip() for item in component.split(';')]
 
+        # Skip empty components (e.g. trailing commas).
+        if not subcomponents[0]:
+            continue
+
+        quality = 1.0
+        for parameter in subcomponents[1:]:
+            if parameter.startswith('q='):
+                try:
+                    quality = float(parameter[2:])
+                except ValueError:
+                    pass
+
+        if quality > 0:
+            l.append((quality, subcomponents[0]))
+
+    # Sorting is stable, so content types of equal quality keep their order.
     l.sort(
-        key = lambda i: i[1],
+        key = lambda i: i[0],
         reverse = True
     )
 
-    content_types = []
-    for i in l:
-        content_types.append(i[0])
-
-    return content_types
+    return tuple([i[1] for i in l])
@@ -53,22 +53,13 @@ class Views(object):
         on the format given in DEFAULT_FORMAT.
         """
 
-        # Derive a list of 'formats.Format' instances from the list of formats these views support.
-        supported_formats = [formats.find(format) for format in self.supported_formats]
+        supported_formats, by_extension, by_content_type, default_format = self._get_supported_formats()
 
         # Determine format by extension...
         if '.' in request.path:
             extension = request.path.split('.')[-1]
 
-            try:
-                format = formats.find_by_extension(extension)
-            except formats.UnknownFormat:
-                return None
-
-            if format in supported_formats:
-                return format
-            else:
-                return None
+            return by_extension.get(extension)
 
         # Determine format by HTTP Accept header...
         if 'HTTP_ACCEPT' in request.META:
@@ -84,27 +75,51 @@ class Views(object):
                 if content_type == '*/*':
                     return supported_formats[0]
 
-                try:
-                    format = formats.find_by_content_type(content_type)
-                except formats.UnknownFormat:
-                    return None
-
-                if format in supported_formats:
-                    return format
-                else:
-                    return None
+                return by_content_type.get(content_type)
 
         # If no format is given by either extension or header, default to the format given in
         # RESPITE_DEFAULT_FORMAT (given, of course, that it's supported by the view).
-        if DEFAULT_FORMAT:
-            format = formats.find(DEFAULT_FORMAT)
+        return default_format
 
-            if format in supported_formats:
-                return format
-            else:
-                return None
+    def _get_supported_formats(self):
+        """
+        Return a tuple of the list of 'formats.Format' instances these views support, dictionaries
+        mapping their extensions and content types to them and the default format (or ``None``
+        if it isn't supported).
 
-    def _render(self, request, template=None, status=200, context={}, headers={}, prefix_template_path=True):
+        These are derived once per list of supported formats and cached on the views class,
+        as views may override their supported formats (see ``override_supported_formats``).
+        """
+        cls = self.__class__
+
+        if '_supported_formats_cache' not in cls.__dict__:
+            cls._supported_formats_cache = {}
+
+        key = tuple(self.supported_formats)
+
+        try:
+            return cls._supported_formats_cache[key]
+        except KeyError:
+            supported_formats = [formats.find(format) for format in key]
+
+            by_extension, by_content_type = {}, {}
+            for format in reversed(supported_formats):
+                for extension in format.extensions:
+                    by_extension[extension] = format
+                for content_type in format.content_types:
+                    by_content_type[content_type] = format
+
+            default_format = None
+            if DEFAULT_FORMAT:
+                format = formats.find(DEFAULT_FORMAT)
+
+                if format in supported_formats:
+                    default_format = format
+
+            cls._supported_formats_cache[key] = supported_formats, by_extension, by_content_type, default_format
+            return cls._supported_formats_cache[key]
+
+    def _render(self, request, template=None, status=200, context={}, headers={}, prefix_template_path=True, stream=False):
         """
         Render a HTTP response.
         
@@ -114,6 +129,7 @@ class Views(object):
         :param context: A dictionary describing variables to populate the template with.
         :param headers: A dictionary describing HTTP headers.
         :param prefix_template_path: A boolean describing whether to prefix the template with the view's template path.
+        :param stream: A boolean describing whether to stream the serialized context in chunks, if its serializer can.
         
         Please note that ``template`` must not specify an extension, as one will be appended
         according to the request format. For example, a value of ``blog/posts/index``
@@ -164,7 +180,7 @@ class Views(object):
             except TemplateDoesNotExist:
                 try:
                     response = HttpResponse(
-                        content = serializers.find(format)(context).serialize(request),
+                        content = self._serialize(request, format, context, stream),
                         content_type = '%s; charset=%s' % (format.content_type, settings.DEFAULT_CHARSET),
                         status = status
                     )
@@ -177,7 +193,7 @@ class Views(object):
                     )
         else:
             response = HttpResponse(
-                content = serializers.find(format)(context).serialize(request),
+                content = self._serialize(request, format, context, stream),
                 content_type = '%s; charset=%s' % (format.content_type, settings.DEFAULT_CHARSET),
                 status = status
             )
@@ -187,6 +203,23 @@ class Views(object):
 
         return response
 
+    def _serialize(self, request, format, context, stream=False):
+        """
+        Serialize the given context in the given format.
+
+        :param request: A django.http.HttpRequest instance.
+        :param format: A 'formats.Format' instance.
+        :param context: A dictionary describing variables to serialize.
+        :param stream: A boolean describing whether to return an iterator over chunks of the serialization
+                       (for a streaming response), if the serializer supports it.
+        """
+        serializer = serializers.find(format)(context)
+
+        if stream and hasattr(serializer, 'stream'):
+            return serializer.stream(request)
+        else:
+            return serializer.serialize(request)
+
     def _error(self, request, status, headers={}, prefix_template_path=False, **kwargs):
         """
         Convenience method to render an error response. The template is inferred from the status code.
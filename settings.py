@@ -35,6 +35,9 @@ DBINDEXER_BACKENDS = (
     'dbindexer.backends.InMemoryJOINResolver',
 )
 
+# Record query shapes and suggest missing indexes (manage.py index_suggestions)
+DBINDEXER_WATCH = False
+
 # DEVELOPMENT
 # # Running in development, so use a local MySQL database.
 # DATABASES = {